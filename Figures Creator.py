@@ -9,8 +9,8 @@
 #                                                                       #
 #                                                                       #
 #   This programm is coded in Python language and needs special         #
-#   libraries to work. Especially Numpy and Matplotlib libraries are    #
-#   necessary and the programm can't work without them.                 #
+#   libraries to work. Especially Numpy, Matplotlib and Scipy           #
+#   libraries are necessary and the programm can't work without them.   #
 #                                                                       #
 #########################################################################
 
@@ -26,7 +26,19 @@
 
 import numpy as np
 import csv
+import os
+import copy
+import time
+import functools
+import multiprocessing
+from scipy.optimize import least_squares
+import scipy.fft
+from cable_characterization import read_fit,evaluate_fit
+import tempfile
+import shutil
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_pdf import PdfPages
 
 
@@ -50,6 +62,7 @@ class Medium():
     - impedance : electrical impedance of the medium ( default value = None )
     - phase_velocity : the phase velocity of electical waves in the medium ( default value = None )
     - attenuation_function : a function of lineic attenuation depending on the pulsation of the electrical wave inside the medium ( default value = None )
+    - attenuation_derivative : the derivative of attenuation_function with respect to the pulsation, a finite difference is used if not given ( default value = None )
     - name : the designated name of the medium ( default value = None ) 
 
     Attributes :
@@ -58,6 +71,7 @@ class Medium():
     - impedance : electrical impedance of the medium
     - phase_velocity : the phase velocity of electical waves in the medium
     - attenuation_function : a function of lineic attenuation depending on the pulsation of the electrical wave inside the medium
+    - attenuation_derivative : the derivative of attenuation_function with respect to the pulsation
     - name : the designated name of the medium
     
     Fonctions :
@@ -65,11 +79,12 @@ class Medium():
     - none
     
     '''
-    def __init__(self,length=None,impedance=None,phase_velocity=None,attenuation_function=None,name=None):
+    def __init__(self,length=None,impedance=None,phase_velocity=None,attenuation_function=None,name=None,attenuation_derivative=None):
         self.length=length
         self.impedance=impedance
         self.phase_velocity=phase_velocity
         self.attenuation_function=attenuation_function
+        self.attenuation_derivative=attenuation_derivative
         self.name=name
 
 #########################################################################
@@ -113,16 +128,28 @@ class Multi_Layered_Media_Model():
     - refraction_indexes : contains the rafraction indexes calculated on the pulsations range
     - wave_numbers : contains the wave numbers calculated on the pulsations range
     - group_velocities : contains the group velocities calculated on the pulsations range
+    - group_delays : contains the group delays calculated on the pulsations range by overall_group_delays
+    - tolerance_non_finite : contains the numbers of non finite |t| and group velocities left out by tolerance_analysis
     
     Fonctions :
 
     - __str__ : lets the user use the print() function directly to get the layout of the model
     - total_length : calculates the total length of the coaxial model
     - overall_transmission : calculates and returns the c_transmissions and c_reflections ( calculates the transfer function )
+    - adaptive_transmission : calculates the c_transmissions and c_reflections on an adaptive pulsation range refined where they change fastest
+    - transfer_matrix : calculates the stacked 2x2 transfer matrices of the whole model on a pulsation range
+    - unit_cell_matrix : calculates the stacked 2x2 transfer matrices of one period of the base layers
+    - overall_group_delays : calculates the exact group delays and group velocities by propagating the derivative of the transmissions
+    - tolerance_analysis : calculates percentile bands of |t| and of the group velocities over random realizations of the layers
+    - transmission_jacobian : calculates the c_transmissions and their analytic derivatives with respect to the parameters of some media
+    - fit_transmissions : fits the parameters of some media on measured transmissions and returns the fitted media with the covariances
+    - cell_length : calculates the length of one period of the base layers
+    - overall_bloch_wave_numbers : calculates the complex Bloch wave numbers from the unit cell matrix ( alternation layout only )
     - overall_phases : gets the arguments of the complex transmissions and return them ( calculates the phases )
     - overall_phase_shifts : calculates the phase shifts using the phases
     - overall_refraction_indexes : calculates the refraction indexes using previous data
     - overall_wave_numbers : calculates the wave numbers using previous data
+    - stream_wave_numbers : goes through a pulsation range chunk by chunk to calculate the phase shifts and wave numbers with a bounded memory
     - overall_group_velocities : calculates the group velocities using previous data
     
     '''
@@ -146,6 +173,7 @@ class Multi_Layered_Media_Model():
             self.layers=layers
         # We then define other variables using the inputs of the initialization
         self.n_layers=len(self.layers)
+        self.build_mode=build_mode
         self.n_alternation=n_alternation
         self.input_medium=input_medium
         self.output_medium=output_medium
@@ -159,6 +187,8 @@ class Multi_Layered_Media_Model():
         self.refraction_indexes=None
         self.wave_numbers=None
         self.group_velocities=None
+        self.group_delays=None
+        self.tolerance_non_finite=None
         
 
         
@@ -176,13 +206,25 @@ class Multi_Layered_Media_Model():
             d=d+self.layers[i].length
         return d
     
-    def overall_transmission(self,w):
+    def overall_transmission(self,w,engine='transfer_matrix'):
         # As mentionned above, calculates the transfer function values for a given pulsation range ( given with w )
-        # We first verify that we have a input and output medium as the methode used needs one
-        assert self.input_medium!=None ;" No Input Medium defined "
-        assert self.output_medium!=None ;" No Output Medium defined "
+        # Two engines are available : 'transfer_matrix' ( default ) reduces stacks of 2x2 transfer matrices over the whole
+        # pulsation range while 'recursion' walks the layers one by one with the original Airy formulas
+        assert self.input_medium is not None,"No Input Medium defined"
+        assert self.output_medium is not None,"No Output Medium defined"
+        assert engine in ('transfer_matrix','recursion'),"Unknown engine : "+str(engine)
+        if engine=='transfer_matrix':
+            M=self.transfer_matrix(w)
+            t=1/M[...,0,0]
+            r=M[...,1,0]/M[...,0,0]
+            self.c_transmissions=t
+            self.r_transmissions=r
+            self.pulsations=w
+            return t,r
         t=1
         r=1
+        # The propagation factors of every distinct medium are only calculated once and reused by all the layers made of it
+        cache={}
         # We calculate the transmission and reflection ratio based on the formulas derived from the matrix modelization of the model
         for k in range(self.n_layers): # k : calculation index
             i=(self.n_layers-1)-k      # i : medium index in the model
@@ -198,11 +240,9 @@ class Multi_Layered_Media_Model():
                 r1plus=reflection(LayerH,LayerI)
                 r2plus=reflection(LayerI,LayerJ)
                 r1minus=reflection(LayerI,LayerH)
-                D=LayerI.length
-                k=LayerI.attenuation_function(w)
-                phase_shift=w*D/LayerI.phase_velocity
-                t=(t1plus*t2plus*np.exp(1j*phase_shift-k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
-                r=r1plus+(t1plus*t1minus*r2plus*np.exp(2j*phase_shift-2*k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
+                single,double=recursion_factors(LayerI,w,cache)
+                t=(t1plus*t2plus*single)/(1-r1minus*r2plus*double)
+                r=r1plus+(t1plus*t1minus*r2plus*double)/(1-r1minus*r2plus*double)
             # Calculation for the first medium of the model layout ( last one to be studied --> k=n_layers-1 )
             elif k==self.n_layers-1:
                 LayerH=self.input_medium
@@ -214,11 +254,9 @@ class Multi_Layered_Media_Model():
                 r1plus=reflection(LayerH,LayerI)
                 r2plus=r
                 r1minus=reflection(LayerI,LayerH)
-                D=LayerI.length
-                k=LayerI.attenuation_function(w)
-                phase_shift=w*D/LayerI.phase_velocity
-                t=(t1plus*t2plus*np.exp(1j*phase_shift-k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
-                r=r1plus+(t1plus*t1minus*r2plus*np.exp(2j*phase_shift-2*k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
+                single,double=recursion_factors(LayerI,w,cache)
+                t=(t1plus*t2plus*single)/(1-r1minus*r2plus*double)
+                r=r1plus+(t1plus*t1minus*r2plus*double)/(1-r1minus*r2plus*double)
             # Calculation for the rest of the layers
             else:
                 LayerH=self.layers[i-1]
@@ -230,33 +268,341 @@ class Multi_Layered_Media_Model():
                 r1plus=reflection(LayerH,LayerI)
                 r2plus=r
                 r1minus=reflection(LayerI,LayerH)
-                D=LayerI.length
-                k=LayerI.attenuation_function(w)
-                phase_shift=w*D/LayerI.phase_velocity
-                t=(t1plus*t2plus*np.exp(1j*phase_shift-k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
-                r=r1plus+(t1plus*t1minus*r2plus*np.exp(2j*phase_shift-2*k*D))/(1-r1minus*r2plus*np.exp(2j*phase_shift-2*k*D))
+                single,double=recursion_factors(LayerI,w,cache)
+                t=(t1plus*t2plus*single)/(1-r1minus*r2plus*double)
+                r=r1plus+(t1plus*t1minus*r2plus*double)/(1-r1minus*r2plus*double)
         # We store the values of the results and return them to the user as well
         self.c_transmissions=t
         self.r_transmissions=r
         self.pulsations=w
         return t,r
 
+    def transfer_matrix(self,w,derivative=False):
+        # Calculates the 2x2 transfer matrices of the whole model on the pulsation range, stacked along the first axis
+        # For the 'alternation' layout the unit cell matrix is raised to the power n_alternation-1 by repeated squaring
+        # so that the cost grows with log(n_alternation) rather than with the number of layers
+        # If derivative is True, the derivatives of the matrices with respect to the pulsation are propagated alongside them
+        # and both stacks are returned
+        # The propagation factors and interface matrices of every distinct medium and interface are only calculated once
+        w=np.asarray(w,dtype=float)
+        cache={}
+        if self.build_mode=='alternation' and self.n_alternation>1:
+            k=len(self.base_layers)
+            C,dC=self.unit_cell_matrix(w,derivative=True,cache=cache) if derivative else (self.unit_cell_matrix(w,cache=cache),None)
+            C,dC=matrix_power_derivative(C,dC,self.n_alternation-1)
+            M,dM=matrix_product_derivative(interface_matrix(self.input_medium,self.base_layers[0],cache),None,C,dC)
+            for j in range(k-1):
+                M,dM=propagation_product(M,dM,self.base_layers[j],w,derivative,cache)
+                M,dM=matrix_product_derivative(M,dM,interface_matrix(self.base_layers[j],self.base_layers[j+1],cache),None)
+            M,dM=propagation_product(M,dM,self.base_layers[k-1],w,derivative,cache)
+            M,dM=matrix_product_derivative(M,dM,interface_matrix(self.base_layers[k-1],self.output_medium,cache),None)
+        else:
+            layout=[self.input_medium]+list(self.layers)+[self.output_medium]
+            I=interface_matrix(layout[0],layout[1],cache)
+            M,dM=np.broadcast_to(I,np.broadcast_shapes(I.shape[:-2],w.shape)+(2,2)),None
+            for i in range(1,len(layout)-1):
+                M,dM=propagation_product(M,dM,layout[i],w,derivative,cache)
+                M,dM=matrix_product_derivative(M,dM,interface_matrix(layout[i],layout[i+1],cache),None)
+        if derivative:
+            return M,dM
+        return M
+
+    def unit_cell_matrix(self,w,derivative=False,cache=None):
+        # Calculates the transfer matrices of one period of the base layers ( each layer followed by the interface
+        # to the next one, the last base layer looping back to the first one ), and their derivatives if asked
+        # A cache of the factors already calculated on w can be shared with the caller ( see propagation_factors() )
+        w=np.asarray(w,dtype=float)
+        k=len(self.base_layers)
+        M,dM=np.identity(2,dtype=complex),None
+        for j in range(k):
+            M,dM=propagation_product(M,dM,self.base_layers[j],w,derivative,cache)
+            M,dM=matrix_product_derivative(M,dM,interface_matrix(self.base_layers[j],self.base_layers[(j+1)%k],cache),None)
+        if derivative:
+            return M,dM
+        return M
+
+    def overall_group_delays(self,w):
+        # Calculates the exact group delays and group velocities at any set of pulsations ( sparse or irregular ) by
+        # propagating dt/dw through the layers : with t=1/M11, dt/dw=-t^2*dM11/dw and the group delay is the derivative
+        # of the phase Im((dt/dw)/t), the group velocity being the total length divided by the group delay
+        assert self.input_medium is not None,"No Input Medium defined"
+        assert self.output_medium is not None,"No Output Medium defined"
+        w=np.asarray(w,dtype=float)
+        M,dM=self.transfer_matrix(w,derivative=True)
+        t=1/M[...,0,0]
+        dtdw=-t*t*dM[...,0,0]
+        delays=(dtdw/t).imag
+        self.c_transmissions=t
+        self.r_transmissions=M[...,1,0]/M[...,0,0]
+        self.pulsations=w
+        self.group_delays=delays
+        self.group_velocities=self.total_length()/delays
+        return delays,self.group_velocities
+
+    def adaptive_transmission(self,w_min,w_max,tolerance=1e-3,n_initial=201,max_points=50000):
+        # Calculates the transfer function on an adaptive pulsation range between w_min and w_max : we start from a coarse
+        # uniform range and keep splitting the intervals in two where the midpoint value is badly predicted by its neighbours,
+        # judging on log|t|, on the phase and on the group delay ( relative change between both halves ), until all the errors
+        # are below the tolerance or max_points pulsations were used. The results are stored like in overall_transmission
+        # and the following overall_... functions handle the non-uniform range
+        assert self.input_medium is not None,"No Input Medium defined"
+        assert self.output_medium is not None,"No Output Medium defined"
+        w=np.linspace(w_min,w_max,num=int(n_initial))
+        M=self.transfer_matrix(w)
+        W=[w]
+        T=[1/M[:,0,0]]
+        R=[M[:,1,0]/M[:,0,0]]
+        # Active intervals are described by their bounds and the transmissions at those bounds
+        a,b=w[:-1],w[1:]
+        ta,tb=T[0][:-1],T[0][1:]
+        n_points=w.shape[0]
+        min_step=(w_max-w_min)*1e-9
+        while a.shape[0]!=0 and n_points<max_points:
+            m=(a+b)/2
+            M=self.transfer_matrix(m)
+            tm=1/M[:,0,0]
+            W.append(m)
+            T.append(tm)
+            R.append(M[:,1,0]/M[:,0,0])
+            n_points=n_points+m.shape[0]
+            # Interpolation errors at the midpoints
+            amplitude_error=abs(np.log(abs(tm))-(np.log(abs(ta))+np.log(abs(tb)))/2)
+            left_phase=np.angle(tm/ta)
+            right_phase=np.angle(tb/tm)
+            phase_error=abs(left_phase-right_phase)/2
+            left_delay=left_phase/(m-a)
+            right_delay=right_phase/(b-m)
+            delay_error=abs(left_delay-right_delay)/np.maximum((abs(left_delay)+abs(right_delay))/2,1e-300)
+            error=np.maximum(np.maximum(amplitude_error,phase_error),delay_error)
+            refine=(error>tolerance)&(b-a>min_step)
+            a,m,b=a[refine],m[refine],b[refine]
+            ta,tm,tb=ta[refine],tm[refine],tb[refine]
+            a,b=np.concatenate((a,m)),np.concatenate((m,b))
+            ta,tb=np.concatenate((ta,tm)),np.concatenate((tm,tb))
+        w=np.concatenate(W)
+        order=np.argsort(w)
+        t=np.concatenate(T)[order]
+        r=np.concatenate(R)[order]
+        self.c_transmissions=t
+        self.r_transmissions=r
+        self.pulsations=w[order]
+        return self.pulsations,t,r
+
+    def tolerance_analysis(self,w,n_realizations=1000,length_tolerance=0.01,impedance_tolerance=0.02,velocity_tolerance=0.01,
+                           percentiles=(5,50,95),batch_size=None,n_bins=100,seed=None,exact=False):
+        # Monte Carlo tolerance analysis : every layer of the model gets its own random length, impedance and phase velocity
+        # ( normal draws of relative standard deviations length_tolerance, impedance_tolerance and velocity_tolerance )
+        # The realizations are evaluated by batches in one computation, the media holding arrays of shape ( batch_size , 1 )
+        # that broadcast against the pulsations, and the results are accumulated in histograms ( one per pulsation, of n_bins
+        # bins ) so that the memory stays bounded as n_realizations grows. The range of the histograms starts as the one of
+        # the first batch with margins and, for every pulsation where a later batch falls outside of it, is doubled as many
+        # times as needed, pairs of bins being merged, so that no value is ever clipped into the edge bins
+        # The non finite values ( infinite group velocity of a zero group delay , log10|t| of a zero |t| , NaN ) are left out of
+        # the histograms and of the percentiles, and counted for every pulsation in tolerance_non_finite ( shape ( 2 , len(w) ) )
+        # If exact is True, all the values are kept and the percentiles are calculated exactly ( for small checks )
+        # Returns the percentiles of |t| and of the group velocities as arrays of shape ( len(percentiles) , len(w) )
+        assert self.input_medium is not None,"No Input Medium defined"
+        assert self.output_medium is not None,"No Output Medium defined"
+        w=np.asarray(w,dtype=float)
+        N=w.shape[0]
+        n_bins=n_bins+n_bins%2
+        if batch_size is None:
+            batch_size=max(1,1000000//N)
+        generator=np.random.default_rng(seed)
+        histograms=[np.zeros((N,n_bins),dtype=np.int64),np.zeros((N,n_bins),dtype=np.int64)]
+        bounds=[None,None]
+        kept=[[],[]]
+        self.tolerance_non_finite=np.zeros((2,N),dtype=np.int64)
+        done=0
+        while done<n_realizations:
+            B=min(batch_size,n_realizations-done)
+            layers=[]
+            for layer in self.layers:
+                medium=copy.copy(layer)
+                medium.length=layer.length*(1+length_tolerance*generator.standard_normal((B,1)))
+                medium.impedance=layer.impedance*(1+impedance_tolerance*generator.standard_normal((B,1)))
+                medium.phase_velocity=layer.phase_velocity*(1+velocity_tolerance*generator.standard_normal((B,1)))
+                layers.append(medium)
+            realizations=Multi_Layered_Media_Model(layers=layers,input_medium=self.input_medium,output_medium=self.output_medium)
+            M,dM=realizations.transfer_matrix(w,derivative=True)
+            t=1/M[...,0,0]
+            delays=(-t*dM[...,0,0]).imag
+            quantities=[np.log10(abs(t)),realizations.total_length()/delays]
+            for q in range(2):
+                finite=np.isfinite(quantities[q])
+                self.tolerance_non_finite[q]+=(~finite).sum(axis=0)
+                if exact:
+                    kept[q].append(np.where(finite,quantities[q],np.nan))
+                    continue
+                # The ranges of the batch only cover its finite values ( empty range if there is none )
+                batch_low=np.where(finite,quantities[q],np.inf).min(axis=0)
+                batch_high=np.where(finite,quantities[q],-np.inf).max(axis=0)
+                if bounds[q] is None:
+                    low=np.where(finite.any(axis=0),batch_low,0)
+                    high=np.where(finite.any(axis=0),batch_high,0)
+                    margin=np.maximum((high-low)/2,1e-12*np.maximum(abs(high),1))
+                    bounds[q]=(low-margin,high+margin)
+                low,high=bounds[q]
+                # The range of the pulsations exceeded by this batch is doubled upwards ( bins 2k and 2k+1 merged into bin k )
+                # or downwards ( bin j merged into bin (j+n_bins)//2 ) until it holds the whole batch
+                while True:
+                    up=batch_high>=high
+                    down=(batch_low<low)&~up
+                    if not (up.any() or down.any()):
+                        break
+                    histograms[q][up]=np.concatenate((histograms[q][up].reshape(-1,n_bins//2,2).sum(axis=2),
+                                                      np.zeros((up.sum(),n_bins//2),dtype=np.int64)),axis=1)
+                    histograms[q][down]=np.concatenate((np.zeros((down.sum(),n_bins//2),dtype=np.int64),
+                                                        histograms[q][down].reshape(-1,n_bins//2,2).sum(axis=2)),axis=1)
+                    width=high-low
+                    high=np.where(up,high+width,high)
+                    low=np.where(down,low-width,low)
+                bounds[q]=(low,high)
+                index=np.clip(((np.where(finite,quantities[q],low)-low)/(high-low)*n_bins).astype(np.int64),0,n_bins-1)
+                index=index+np.arange(N)*n_bins
+                histograms[q]=histograms[q]+np.bincount(index[finite],minlength=N*n_bins).reshape(N,n_bins)
+            done=done+B
+        if exact:
+            return 10**np.nanpercentile(np.concatenate(kept[0]),percentiles,axis=0),np.nanpercentile(np.concatenate(kept[1]),percentiles,axis=0)
+        results=[]
+        for q in range(2):
+            low,high=bounds[q]
+            cumulated=np.cumsum(histograms[q],axis=1)
+            counts=n_realizations-self.tolerance_non_finite[q]
+            values=np.empty((len(percentiles),N))
+            for p in range(len(percentiles)):
+                target=percentiles[p]/100*counts
+                index=np.minimum((cumulated<target[:,np.newaxis]).sum(axis=1),n_bins-1)
+                before=np.where(index>0,cumulated[np.arange(N),index-1],0)
+                inside=cumulated[np.arange(N),index]-before
+                fraction=np.clip((target-before)/np.maximum(inside,1),0,1)
+                values[p]=np.where(counts>0,low+(index+fraction)*(high-low)/n_bins,np.nan)
+            results.append(values)
+        return 10**results[0],results[1]
+
+    def transmission_jacobian(self,w,media,parameters=('length','impedance','velocity_factor')):
+        # Calculates the complex transmissions and their analytic derivatives with respect to the parameters of the given media
+        # ( 'length', 'impedance' and 'velocity_factor' = phase_velocity/c ), returned as an array of shape ( len(w) , n_parameters )
+        # ordered medium by medium. The whole layout is written as a chain of interface and propagation matrices and the
+        # derivative of the product is the sum over the factors depending on a parameter of prefix*dFactor*suffix
+        w=np.asarray(w,dtype=float)
+        layout=[self.input_medium]+list(self.layers)+[self.output_medium]
+        cache={}
+        factors=[interface_matrix(layout[0],layout[1],cache)]
+        for i in range(1,len(layout)-1):
+            factors.append(propagation_product(np.identity(2,dtype=complex),None,layout[i],w,False,cache)[0])
+            factors.append(interface_matrix(layout[i],layout[i+1],cache))
+        n=len(factors)
+        prefixes=[np.identity(2,dtype=complex)]
+        for i in range(n-1):
+            prefixes.append(matrix_product(prefixes[-1],factors[i]))
+        suffixes=[np.identity(2,dtype=complex)]
+        for i in range(n-1,0,-1):
+            suffixes.insert(0,matrix_product(factors[i],suffixes[0]))
+        M=matrix_product(prefixes[-1],factors[-1])
+        t=1/M[...,0,0]
+        jacobian=np.zeros(w.shape+(len(media)*len(parameters),),dtype=complex)
+        flip=np.array([[1,-1],[-1,1]],dtype=complex)
+        for i in range(n):
+            if i%2==0:
+                # Interface from layout[i//2] to layout[i//2+1], I=0.5*[[1+zb/za,1-zb/za],[1-zb/za,1+zb/za]]
+                a,b=layout[i//2],layout[i//2+1]
+                derivatives=[(a,'impedance',-b.impedance/(2*a.impedance**2)*flip),(b,'impedance',flip/(2*a.impedance))]
+            else:
+                # Propagation through layout[(i+1)//2], dP/dx=diag(-i*exp(-i*delta),i*exp(i*delta))*d(delta)/dx
+                medium=layout[(i+1)//2]
+                attenuation=medium.attenuation_function(w)
+                factor=medium.phase_velocity/constant('c')
+                ddelta_dlength=w/medium.phase_velocity+1j*attenuation
+                ddelta_dfactor=-w*medium.length/(medium.phase_velocity*factor)
+                dP=np.zeros(np.shape(w)+(2,2),dtype=complex)
+                dP[...,0,0]=-1j*factors[i][...,0,0]
+                dP[...,1,1]=1j*factors[i][...,1,1]
+                derivatives=[(medium,'length',dP*ddelta_dlength[...,np.newaxis,np.newaxis]),
+                             (medium,'velocity_factor',dP*ddelta_dfactor[...,np.newaxis,np.newaxis])]
+            for medium,parameter,dF in derivatives:
+                if parameter not in parameters:
+                    continue
+                for m in range(len(media)):
+                    if media[m] is medium:
+                        dM=matrix_product(matrix_product(prefixes[i],dF),suffixes[i])
+                        jacobian[...,m*len(parameters)+parameters.index(parameter)]+=-t*t*dM[...,0,0]
+        return t,jacobian
+
+    def fit_transmissions(self,w,measured,media=None,parameters=('length','impedance','velocity_factor')):
+        # Fits the parameters of the given media ( the base layers by default ) so that the model |t| matches measured |t| values
+        # at the pulsations w, by least squares on log|t| with the analytic jacobian of transmission_jacobian()
+        # The model is only evaluated at the measured pulsations. Returns fitted copies of the media ( in the same order ),
+        # the covariance matrix of the fitted parameters and the names of these parameters
+        if media is None:
+            media=[]
+            for layer in self.base_layers:
+                if all(layer is not medium for medium in media):
+                    media.append(layer)
+        w=np.asarray(w,dtype=float)
+        measured=np.asarray(measured,dtype=float)
+        fitted=[copy.copy(medium) for medium in media]
+        def model_for(x):
+            for m in range(len(fitted)):
+                for p in range(len(parameters)):
+                    value=x[m*len(parameters)+p]
+                    if parameters[p]=='velocity_factor':
+                        fitted[m].phase_velocity=value*constant('c')
+                    else:
+                        setattr(fitted[m],parameters[p],value)
+            replace=lambda layer : next((fitted[m] for m in range(len(media)) if media[m] is layer),layer)
+            return Multi_Layered_Media_Model(layers=[replace(layer) for layer in self.layers],input_medium=replace(self.input_medium),
+                                             output_medium=replace(self.output_medium))
+        def residuals(x):
+            t,jacobian=model_for(x).transmission_jacobian(w,fitted,parameters)
+            return np.log(abs(t))-np.log(measured)
+        def jacobian(x):
+            t,jacobian=model_for(x).transmission_jacobian(w,fitted,parameters)
+            return (jacobian/t[:,np.newaxis]).real
+        x0=[]
+        names=[]
+        for medium in media:
+            for parameter in parameters:
+                x0.append(medium.phase_velocity/constant('c') if parameter=='velocity_factor' else getattr(medium,parameter))
+                names.append(str(medium.name)+'.'+parameter)
+        result=least_squares(residuals,np.array(x0,dtype=float),jac=jacobian,x_scale='jac')
+        model_for(result.x)
+        dof=max(1,measured.shape[0]-result.x.shape[0])
+        covariance=np.linalg.pinv(result.jac.T@result.jac)*np.sum(result.fun**2)/dof
+        return fitted,covariance,names
+
+    def cell_length(self):
+        # Gives the length of one period of the base layers ( the lattice constant of the crystal )
+        d=0
+        for i in range(len(self.base_layers)):
+            d=d+self.base_layers[i].length
+        return d
+
+    def overall_bloch_wave_numbers(self,w=None):
+        # Calculates the Bloch wave numbers of the infinite crystal directly from the dispersion relation
+        # cos(k*L) = (M11+M22)/2 where M is the unit cell matrix and L the cell length, no phase unwrapping needed
+        # The real part is folded in the first Brillouin zone [0,pi/L] and the imaginary part gives the decay in band gaps
+        assert self.build_mode=='alternation',"Bloch wave numbers need a periodic 'alternation' layout"
+        if w is None:
+            w=self.pulsations
+        M=self.unit_cell_matrix(w)
+        half_trace=(M[...,0,0]+M[...,1,1])/2
+        numbers=np.arccos(half_trace)/self.cell_length()
+        self.pulsations=w
+        self.wave_numbers=numbers.real
+        return numbers
+
     def overall_phases(self):
         # We extract the phases by calculating the arguments of the transmissions that are imaginary values
-        self.phases=np.arctan(self.c_transmissions.imag/self.c_transmissions.real)
+        # np.angle() keeps the quadrant of the transmissions, giving phases in ]-pi,pi]
+        self.phases=np.angle(self.c_transmissions)
         return self.phases
     
     def overall_phase_shifts(self):
-        # We calculate the phase shifts by adding 180° each time the phases go from +180° to -180°,if we reason in degrees.
+        # We calculate the phase shifts by adding 360° each time the phases go from +180° to -180°,if we reason in degrees.
         # Here we reason in radians
-        phase_shifts=np.zeros_like(self.phases)
-        m=0
-        for i in range(self.phases.shape[0]):
-            if i!=0 and self.phases[i-1]==abs(self.phases[i-1]) and self.phases[i]==-abs(self.phases[i]):
-                m=m+1
-            phase_shifts[i]=self.phases[i]+m*np.pi
-        self.phase_shifts=phase_shifts
-        return phase_shifts
+        self.phase_shifts=unwrap_phases(self.phases)
+        return self.phase_shifts
 
     def overall_refraction_indexes(self):
         # We calculate the refraction indexes using the phase shifts calculated just above, we then store the velues
@@ -264,28 +610,215 @@ class Multi_Layered_Media_Model():
         self.refraction_indexes=indexes
         return indexes
 
-    def overall_wave_numbers(self):
-        # We calculate the wave numbers using the dispersion relation and storing those values
+    def overall_wave_numbers(self,zone_edge=None):
+        # We calculate the wave numbers using the dispersion relation and fold them into the first Brillouin zone [0,zone_edge]
+        # The zone edge defaults to pi divided by the length of one period of the base layers
+        if zone_edge is None:
+            zone_edge=np.pi/self.cell_length()
         numbers=(self.refraction_indexes*self.pulsations)/constant('c')
-        N=numbers.shape[0]
-        k0=0.314
-        for i in range(N):
-            k=numbers[i]
-            while k>=k0:
-                k=2*k0-abs(k)
-                k=abs(k)
-            numbers[i]=k
-        self.wave_numbers=numbers
-        return numbers
+        self.wave_numbers=fold_wave_numbers(numbers,zone_edge)
+        return self.wave_numbers
+
+    def stream_wave_numbers(self,w,chunk_size=10000,zone_edge=None):
+        # Generator going through a pulsation range chunk by chunk so that arbitrarily long sweeps use a bounded memory
+        # w is either an array ( then cut in chunks of chunk_size pulsations ) or any iterable of pulsation chunks
+        # The last unwrapped phase of each chunk is carried to the next one, each step yields the pulsations,
+        # the complex transmissions, the phase shifts and the folded wave numbers of the chunk
+        if zone_edge is None:
+            zone_edge=np.pi/self.cell_length()
+        chunks=w
+        if isinstance(w,np.ndarray):
+            chunks=(w[i:i+chunk_size] for i in range(0,w.shape[0],chunk_size))
+        L=self.total_length()
+        previous=None
+        for chunk in chunks:
+            M=self.transfer_matrix(chunk)
+            t=1/M[...,0,0]
+            phase_shifts=unwrap_phases(np.angle(t),previous)
+            previous=phase_shifts[-1]
+            yield chunk,t,phase_shifts,fold_wave_numbers(phase_shifts/L,zone_edge)
 
     def overall_group_velocities(self):
         # We calculate the group velocities on the pulsation range and store the values
-        dw=self.pulsations[1]-self.pulsations[0]
-        dndw=np.gradient(self.refraction_indexes,dw) #np.gradient() is a finite derivative method so that we can get dn/dw
+        # Giving the pulsations themselves to np.gradient() lets it handle non-uniform ( adaptive ) pulsation ranges
+        dndw=np.gradient(self.refraction_indexes,self.pulsations) #np.gradient() is a finite derivative method so that we can get dn/dw
         self.group_velocities=constant('c')/(self.refraction_indexes+self.pulsations*dndw)
         return self.group_velocities
 
 
+#########################################################################
+#                                                                       #
+#   We create a Python Object keeping the measured attenuation tables   #
+#   of the cables so that each file is only read once.                  #
+#                                                                       #
+#########################################################################
+
+class Attenuation_Registry():
+    '''
+    The Attenuation_Registry class keeps the measured attenuation tables of the cables, looked up by the cable name.
+    Each table is only read when first needed and kept in memory as contiguous arrays, it is read again only if the
+    modification time of its file changes.
+
+    The table files are setup a certain way :
+    frequency
+    attenuation
+    frequency
+    attenuation
+    ....
+
+    Parameters :
+
+    - files : dictionnary giving the table file name of each cable name ( default value = {} )
+
+    Attributes :
+
+    - files : the table file name of each cable name
+    - tables : the loaded tables of each cable name as ( modification time, pulsations, attenuations, slopes )
+
+    Fonctions :
+
+    - register : adds or replaces the table file of a cable name
+    - load : returns the loaded table of a cable, reading its file on first use or if it was modified
+    - table : returns the pulsations and attenuations arrays of a cable
+    - evaluate : returns the linear interpolation of the attenuations of a cable on given pulsations
+    - evaluate_derivative : returns the derivative of this linear interpolation on given pulsations
+    - interpolant : returns a function of the pulsation interpolating the attenuations of a cable
+    - interpolant_derivative : returns a function of the pulsation giving the derivative of this interpolation
+
+    '''
+    def __init__(self,files={}):
+        self.files=dict(files)
+        self.tables={}
+
+    def register(self,name,file_name):
+        # We add the file to the known ones and forget any table previously loaded under this name
+        self.files[name]=file_name
+        self.tables.pop(name,None)
+
+    def load(self,name):
+        # We check the modification time of the file and read it again only if it changed since the last reading
+        file_name=self.files[name]
+        mtime=os.stat(file_name).st_mtime_ns
+        entry=self.tables.get(name)
+        if entry is None or entry[0]!=mtime:
+            data=np.loadtxt(file_name).reshape(-1,2)
+            data=data[np.argsort(data[:,0])]
+            pulsations=np.ascontiguousarray(2*np.pi*data[:,0])
+            attenuations=np.ascontiguousarray(data[:,1])
+            slopes=np.diff(attenuations)/np.diff(pulsations)
+            entry=(mtime,pulsations,attenuations,slopes)
+            self.tables[name]=entry
+        return entry
+
+    def table(self,name):
+        # Returns the pulsations and the attenuations of the table
+        entry=self.load(name)
+        return entry[1],entry[2]
+
+    def evaluate(self,name,w):
+        # Linear interpolation of the table, constant outside of the measured range like np.interp()
+        entry=self.load(name)
+        return np.interp(w,entry[1],entry[2])
+
+    def evaluate_derivative(self,name,w):
+        # Slope of the linear interpolation of the table, zero outside of the measured range
+        entry=self.load(name)
+        pulsations,slopes=entry[1],entry[3]
+        index=np.clip(np.searchsorted(pulsations,w,side='right')-1,0,slopes.shape[0]-1)
+        inside=(w>=pulsations[0])&(w<=pulsations[-1])
+        return np.where(inside,slopes[index],0.0)
+
+    def interpolant(self,name):
+        # functools.partial() is used rather than a lambda so that the interpolant can be sent to worker processes
+        return functools.partial(self.evaluate,name)
+
+    def interpolant_derivative(self,name):
+        return functools.partial(self.evaluate_derivative,name)
+
+
+class Attenuation_Fit():
+    '''
+    The Attenuation_Fit class is a function of the pulsation giving the attenuation of a cable from the coefficients
+    file written by the fit of cable_characterization.py, so that a new fit is used by the model without changing the code.
+    The polynomial fits are evaluated with the Horner method on the scaled pulsations u=(w-center)/scale, and the values
+    on a given grid of pulsations can be calculated once and kept in a lookup table.
+
+    Parameters :
+
+    - file_name : name of the coefficients file of the cable
+
+    Attributes :
+
+    - file_name : name of the coefficients file of the cable
+    - fit : the fit read from the file ( see cable_characterization.read_fit() )
+    - name : name of the cable
+    - grid : pulsations of the lookup table ( None if there is none )
+    - values : attenuations on the pulsations of the lookup table
+    - derivatives : derivatives of the attenuations on the pulsations of the lookup table
+
+    Fonctions :
+
+    - load : reads the coefficients file again
+    - evaluate : returns the attenuations on given pulsations
+    - evaluate_derivative : returns the derivatives of the attenuations on given pulsations
+    - tabulate : calculates the lookup table on a given grid of pulsations
+    - derivative : same as evaluate_derivative() but using the lookup table on its grid
+
+    '''
+    def __init__(self,file_name):
+        self.file_name=file_name
+        self.grid=None
+        self.load()
+
+    def load(self):
+        # The coefficients of the derivative are calculated once, already divided by the scale of the pulsations
+        self.fit,self.name=read_fit(self.file_name)
+        coefficients=self.fit['coefficients']
+        self.derivative_coefficients=np.arange(1,coefficients.shape[0])*coefficients[1:]/self.fit['scale']
+        self.grid=None
+
+    def horner(self,coefficients,w):
+        # Horner evaluation of the polynomial of the scaled pulsations, one multiplication and one addition per degree
+        u=(np.asarray(w,dtype=float)-self.fit['center'])/self.fit['scale']
+        if coefficients.shape[0]==0:
+            return np.zeros_like(u)
+        y=np.full_like(u,coefficients[-1])
+        for c in coefficients[-2::-1]:
+            y*=u
+            y+=c
+        return y
+
+    def evaluate(self,w):
+        if self.fit['model']=='polynomial':
+            return self.horner(self.fit['coefficients'],w)
+        return evaluate_fit(self.fit,w)
+
+    def evaluate_derivative(self,w):
+        if self.fit['model']=='polynomial':
+            return self.horner(self.derivative_coefficients,w)
+        # Central finite difference for the other models
+        h=1e-6*np.maximum(abs(w),1.0)
+        return (evaluate_fit(self.fit,w+h)-evaluate_fit(self.fit,w-h))/(2*h)
+
+    def tabulate(self,w):
+        # The lookup table is used whenever the attenuations are asked on the same pulsations
+        self.grid=np.asarray(w,dtype=float)
+        self.values=self.evaluate(self.grid)
+        self.derivatives=self.evaluate_derivative(self.grid)
+
+    def on_grid(self,w):
+        return self.grid is not None and (w is self.grid or (np.shape(w)==self.grid.shape and np.array_equal(w,self.grid)))
+
+    def __call__(self,w):
+        if self.on_grid(w):
+            return self.values
+        return self.evaluate(w)
+
+    def derivative(self,w):
+        if self.on_grid(w):
+            return self.derivatives
+        return self.evaluate_derivative(w)
+
 
 # FUNCTIONS -------------------------------------------------------------
 
@@ -298,19 +831,22 @@ class Multi_Layered_Media_Model():
 
 # The new attenuations that we mesured and modelized or interpolized to get rough estimates
 
-# For the RG58U cable, we did a curve fit on the data taken from our measurements and got the following expression
-attenuation_RG58U=lambda w : -3.7881791187642735*10**(-36)*(w**4)+2.735326073454789*10**(-27)*(w**3)-6.367690393696193*10**(-19)*(w**2)+1.0397790765150726*10**(-10)*w+0.0012431624352975269
-# It essentially is a fourth degree polynom with coefficients best adapted to the data fed to the program that came up with them
+# For the RG58U cable, we did a curve fit on the data taken from our measurements with cable_characterization.py, giving
+# a fourth degree polynom of the pulsation whose coefficients are read from its coefficients file. Its derivative is used when
+# calculating the exact group delays
+directory=os.path.dirname(os.path.abspath(__file__))
+attenuation_RG58U=Attenuation_Fit(os.path.join(directory,'RG58U','attenuation_fit.txt'))
+attenuation_derivative_RG58U=attenuation_RG58U.derivative
 
 # For the RG59U cable, we sadly couldn't make a curve fit, the fucntio being to difficult to modelize simply
 # We are then forced to do a simple but rough first degree interpolation ( meaning we draw lines between the data points and use that as a makeshift function )
 
-def attenuation_RG59U(w):
-    list_frequencies,list_attenuations=txt_file_translator('RG59U frequencies-attenuations.txt')
-    frequencies=np.array(list_frequencies)
-    pulsations=2*np.pi*np.array(list_frequencies)
-    attenuations=np.array(list_attenuations)
-    return np.interp(w,pulsations,attenuations)
+# The measured tables of both cables are kept by an Attenuation_Registry so that they are only read once
+attenuation_tables=Attenuation_Registry({'RG58U':os.path.join(directory,'RG58U','attenuations.txt'),
+                                         'RG59U':os.path.join(directory,'RG59U','attenuations.txt')})
+
+attenuation_RG59U=attenuation_tables.interpolant('RG59U')
+attenuation_derivative_RG59U=attenuation_tables.interpolant_derivative('RG59U')
 
 def file_reading(nom):
     file=open(nom,'r')
@@ -379,7 +915,414 @@ def reflection(medium1,medium2):
     z2=medium2.impedance
     return (z1-z2)/(z1+z2)
 
+
+def unwrap_phases(phases,previous=None):
+    ''' returns the phase shifts obtained by removing the 2*pi jumps of the phases, if the unwrapped phase preceding
+        the phases is given as previous ( last value of a previous chunk ) the result continues on from it '''
+    if previous is None:
+        return np.unwrap(phases)
+    return np.unwrap(np.concatenate(([previous],phases)))[1:]
+
+def fold_wave_numbers(numbers,zone_edge):
+    ''' returns the wave numbers folded back and forth into the first Brillouin zone [0,zone_edge] '''
+    return abs(np.mod(numbers+zone_edge,2*zone_edge)-zone_edge)
+
+def medium_key(medium,attributes):
+    ''' returns a key identifying a medium by the values of the given attributes, so that different layers made of the same
+        medium ( or of identical media ) share their calculations, or by the medium itself if these values are arrays '''
+    values=tuple(getattr(medium,attribute) for attribute in attributes)
+    try:
+        hash(values)
+    except TypeError:
+        return ('id',id(medium))
+    return values
+
+def interface_matrix(medium1,medium2,cache=None):
+    ''' returns the 2x2 transfer matrix linking the forward and backward waves of a medium1 to those of a medium2
+        ( calculated once per pair of impedances if a cache dictionnary is given ) '''
+    if cache is not None:
+        key=('interface',medium_key(medium1,('impedance',)),medium_key(medium2,('impedance',)))
+        if key not in cache:
+            cache[key]=interface_matrix(medium1,medium2)
+        return cache[key]
+    t=transmission(medium1,medium2)
+    r=reflection(medium1,medium2)
+    # The impedances may be arrays ( one value per realization ), the matrices are then stacked along the leading axes
+    I=np.empty(np.shape(r)+(2,2),dtype=complex)
+    I[...,0,0]=1/t
+    I[...,0,1]=r/t
+    I[...,1,0]=r/t
+    I[...,1,1]=1/t
+    return I
+
+propagation_attributes=('length','phase_velocity','attenuation_function','attenuation_derivative')
+
+def propagation_factors(medium,w,derivative=False,cache=None):
+    ''' returns the factors exp(i*delta) and exp(-i*delta) of the propagation through a medium for every pulsation of w
+        ( with a last axis of length 1 ) and, if derivative is True, the derivative of delta with respect to the pulsation
+        ( None otherwise ). If a cache dictionnary is given ( only valid for this w ), the factors of every distinct medium
+        are only calculated once '''
+    key=('propagation',)+medium_key(medium,propagation_attributes)
+    if cache is not None and key in cache and (cache[key][2] is not None or not derivative):
+        return cache[key]
+    D=medium.length
+    delta=w*D/medium.phase_velocity+1j*medium.attenuation_function(w)*D
+    forward=np.exp(1j*delta)[...,np.newaxis]
+    factors=(forward,1/forward,None)
+    if derivative:
+        factors=(forward,factors[1],(D/medium.phase_velocity+1j*attenuation_derivative(medium,w)*D)[...,np.newaxis])
+    if cache is not None:
+        cache[key]=factors
+    return factors
+
+def recursion_factors(medium,w,cache=None):
+    ''' returns the factors exp(i*phase_shift-k*D) and exp(2i*phase_shift-2*k*D) of a medium used by the recursion engine,
+        calculated once per distinct medium if a cache dictionnary is given '''
+    key=('recursion',)+medium_key(medium,propagation_attributes)
+    if cache is not None and key in cache:
+        return cache[key]
+    D=medium.length
+    k=medium.attenuation_function(w)
+    phase_shift=w*D/medium.phase_velocity
+    factors=(np.exp(1j*phase_shift-k*D),np.exp(2j*phase_shift-2*k*D))
+    if cache is not None:
+        cache[key]=factors
+    return factors
+
+def propagation_product(M,dM,medium,w,derivative=False,cache=None):
+    ''' returns the products of a stack of 2x2 matrices M by the diagonal propagation matrices through a medium
+        diag(exp(-i*delta),exp(i*delta)) for every pulsation of w, obtained by scaling the columns of M, and the
+        derivatives of these products from the derivatives dM of M ( None standing for a constant ) if derivative is True
+        ( the factors being taken from the cache if given, see propagation_factors() ) '''
+    forward,backward,ddelta=propagation_factors(medium,w,derivative,cache)
+    shape=np.broadcast_shapes(np.shape(M)[:-2],forward.shape[:-1])+(2,2)
+    C=np.empty(shape,dtype=complex)
+    C[...,:,0]=M[...,:,0]*backward
+    C[...,:,1]=M[...,:,1]*forward
+    if not derivative:
+        return C,None
+    dC=np.empty(shape,dtype=complex)
+    if dM is None:
+        dC[...,:,0]=-1j*ddelta*C[...,:,0]
+        dC[...,:,1]=1j*ddelta*C[...,:,1]
+    else:
+        dC[...,:,0]=dM[...,:,0]*backward-1j*ddelta*C[...,:,0]
+        dC[...,:,1]=dM[...,:,1]*forward+1j*ddelta*C[...,:,1]
+    return C,dC
+
+def attenuation_derivative(medium,w):
+    ''' returns the derivative of the lineic attenuation of a medium with respect to the pulsation, using the
+        medium's analytic attenuation_derivative if given and a central finite difference otherwise '''
+    if medium.attenuation_derivative is not None:
+        return medium.attenuation_derivative(w)
+    h=1e-6*np.maximum(abs(w),1.0)
+    return (medium.attenuation_function(w+h)-medium.attenuation_function(w-h))/(2*h)
+
+def matrix_product(A,B):
+    ''' returns the products of two stacks of 2x2 matrices ( broadcasted along the leading axes ), written out
+        element by element as it is much faster than np.matmul on such small matrices '''
+    C=np.empty(np.broadcast_shapes(np.shape(A),np.shape(B)),dtype=complex)
+    C[...,0,0]=A[...,0,0]*B[...,0,0]+A[...,0,1]*B[...,1,0]
+    C[...,0,1]=A[...,0,0]*B[...,0,1]+A[...,0,1]*B[...,1,1]
+    C[...,1,0]=A[...,1,0]*B[...,0,0]+A[...,1,1]*B[...,1,0]
+    C[...,1,1]=A[...,1,0]*B[...,0,1]+A[...,1,1]*B[...,1,1]
+    return C
+
+def matrix_product_derivative(A,dA,B,dB):
+    ''' returns the products of two stacks of 2x2 matrices and the derivative of the products from the derivatives
+        dA and dB of the factors ( product rule ), None standing for a constant factor '''
+    C=matrix_product(A,B)
+    if dA is None and dB is None:
+        return C,None
+    if dA is None:
+        return C,matrix_product(A,dB)
+    if dB is None:
+        return C,matrix_product(dA,B)
+    return C,matrix_product(dA,B)+matrix_product(A,dB)
+
+def matrix_power(M,n):
+    ''' returns a stack of 2x2 matrices raised to the integer power n ( n>=0 ) using repeated squaring '''
+    result=np.broadcast_to(np.identity(2,dtype=complex),np.shape(M))
+    square=M
+    while n>0:
+        if n%2==1:
+            result=matrix_product(result,square)
+        n=n//2
+        if n>0:
+            square=matrix_product(square,square)
+    return result
+
+def matrix_power_derivative(M,dM,n):
+    ''' returns a stack of 2x2 matrices raised to the integer power n ( n>=0 ) using repeated squaring and the
+        derivative of the result obtained from the derivative dM of the matrices ( None standing for a constant ) '''
+    result,dresult=np.broadcast_to(np.identity(2,dtype=complex),np.shape(M)),None
+    square,dsquare=M,dM
+    while n>0:
+        if n%2==1:
+            result,dresult=matrix_product_derivative(result,dresult,square,dsquare)
+        n=n//2
+        if n>0:
+            square,dsquare=matrix_product_derivative(square,dsquare,square,dsquare)
+    return result,dresult
+
+def model_variant(model,parameters):
+    ''' returns a copy of a Multi_Layered_Media_Model where some parameters were changed. The parameters are given in
+        a dictionnary whose keys are either 'n_alternation' or 'medium_name.attribute' ( for example 'RG59U.length' ),
+        the media keeping the same layout as in the original model '''
+    copies={}
+    def medium_copy(medium):
+        if medium is None:
+            return None
+        if id(medium) not in copies:
+            copies[id(medium)]=copy.copy(medium)
+        return copies[id(medium)]
+    base_layers=[medium_copy(layer) for layer in model.base_layers]
+    input_medium=medium_copy(model.input_medium)
+    output_medium=medium_copy(model.output_medium)
+    n_alternation=model.n_alternation
+    for key,value in parameters.items():
+        if key=='n_alternation':
+            n_alternation=int(value)
+            continue
+        name,attribute=key.split('.')
+        found=False
+        for medium in copies.values():
+            if medium.name==name:
+                setattr(medium,attribute,value)
+                found=True
+        assert found,"No medium named "+name+" in the model"
+    if model.build_mode=='alternation':
+        return Multi_Layered_Media_Model(layers=base_layers,build_mode='alternation',n_alternation=n_alternation,
+                                         input_medium=input_medium,output_medium=output_medium)
+    return Multi_Layered_Media_Model(layers=[medium_copy(layer) for layer in model.layers],build_mode='direct_define',
+                                     input_medium=input_medium,output_medium=output_medium)
+
+# The state of each worker process of a sweep, filled once by sweep_initializer() so that the model ( and the attenuation
+# tables it uses ) is sent once to every worker rather than with every task
+sweep_state={}
+
+def sweep_initializer(model,w,names,values):
+    ''' stores the sweep description in the worker process '''
+    sweep_state['model']=model
+    sweep_state['w']=w
+    sweep_state['names']=names
+    sweep_state['values']=values
+
+def sweep_task(indices):
+    ''' evaluates the transmissions and group velocities of the sweep points of given flat indices '''
+    model,w,names,values=sweep_state['model'],sweep_state['w'],sweep_state['names'],sweep_state['values']
+    shape=tuple(len(v) for v in values)
+    transmissions=np.empty((len(indices),w.shape[0]),dtype=complex)
+    velocities=np.empty((len(indices),w.shape[0]))
+    for n,index in enumerate(indices):
+        position=np.unravel_index(index,shape)
+        parameters={names[a]:values[a][position[a]] for a in range(len(names))}
+        variant=model_variant(model,parameters)
+        variant.overall_group_delays(w)
+        transmissions[n]=variant.c_transmissions
+        velocities[n]=variant.group_velocities
+    return indices,transmissions,velocities
+
+def parameter_sweep(model,w,parameters,processes=None,chunk_size=None):
+    ''' evaluates a model on a grid of parameters using a pool of worker processes. The parameters are given in a
+        dictionnary of value ranges whose keys are either 'n_alternation' or 'medium_name.attribute' ( for example
+        {'n_alternation':[8,10,12],'RG59U.length':np.linspace(4,6,21)} ).
+        The grid points are cut in chunks sent to the workers and the results gathered in preallocated arrays of shape
+        ( len(range1) , len(range2) , ... , len(w) ).
+        Returns the complex transmissions, the group velocities and the throughput in points per second '''
+    w=np.asarray(w,dtype=float)
+    names=list(parameters.keys())
+    values=[np.asarray(parameters[name]) for name in names]
+    shape=tuple(len(v) for v in values)
+    n_points=int(np.prod(shape))
+    if processes is None:
+        processes=os.cpu_count()
+    if chunk_size is None:
+        chunk_size=max(1,n_points//(4*processes))
+    transmissions=np.empty((n_points,w.shape[0]),dtype=complex)
+    velocities=np.empty((n_points,w.shape[0]))
+    chunks=[list(range(i,min(i+chunk_size,n_points))) for i in range(0,n_points,chunk_size)]
+    start=time.perf_counter()
+    with multiprocessing.Pool(processes,initializer=sweep_initializer,initargs=(model,w,names,values)) as pool:
+        for indices,t,v in pool.imap_unordered(sweep_task,chunks):
+            transmissions[indices]=t
+            velocities[indices]=v
+    throughput=n_points/(time.perf_counter()-start)
+    return transmissions.reshape(shape+w.shape),velocities.reshape(shape+w.shape),throughput
+
+def gaussian_packets(frequencies,fw=10000,width=4*10**(-6),fGBF=200*10**6,Amplitude=10):
+    ''' returns the time axis and the Gaussian packets of all the given frequencies as an array of shape
+        ( len(frequencies) , int(fGBF/fw) ), built exactly like create_file_Gaussian() builds the packets sent to the GBF
+        ( a sinusoid of frequency f0 times a Gaussian of mean 0 and a certain width, normalized to Amplitude ) '''
+    N=int(fGBF/fw)
+    Tw=1/fw
+    X=np.linspace(-Tw/2,Tw/2,num=N)
+    envelope=Amplitude*np.exp(-X**2/(2*width**2))
+    packets=envelope*np.sin(2*np.pi*np.asarray(frequencies,dtype=float)[:,np.newaxis]*X)
+    return X,packets
+
+def simulate_packets(model,X,packets,padding=1.0,threshold=1e-9):
+    ''' returns the output waveforms of a batch of packets ( array of shape ( n_packets , N ) sampled on the uniform time axis X )
+        sent through the model. The packets are zero-padded by padding*N points so that the delayed outputs don't wrap around,
+        transformed with one batched rfft, multiplied by the transmissions of the model and transformed back with irfft.
+        The model is evaluated once for the whole batch and only on the frequency bins where some packet has a spectrum
+        above threshold times the highest spectrum value. ( The model uses exp(+i*w*t) phases and numpy the opposite sign
+        convention, hence the complex conjugate of the transmissions ) '''
+    packets=np.atleast_2d(packets)
+    N=packets.shape[-1]
+    dt=X[1]-X[0]
+    # Keeping the same fast transform length for every batch lets scipy.fft reuse its cached plans
+    n_fft=scipy.fft.next_fast_len(int(N*(1+padding)),real=True)
+    spectra=scipy.fft.rfft(packets,n=n_fft,axis=-1,workers=-1)
+    w=2*np.pi*scipy.fft.rfftfreq(n_fft,dt)
+    magnitude=abs(spectra).max(axis=0)
+    useful=magnitude>threshold*magnitude.max()
+    transmissions=np.zeros(w.shape,dtype=complex)
+    M=model.transfer_matrix(w[useful])
+    transmissions[useful]=np.conj(1/M[...,0,0])
+    return scipy.fft.irfft(spectra*transmissions,n=n_fft,axis=-1,workers=-1)[...,:N]
+
+def centroid_delays(X,inputs,outputs):
+    ''' returns the delays between the centroids of |Y| of the outputs and of the inputs ( arrays of shape ( n_packets , N ) ),
+        integrated with the trapezes method along the uniform time axis X like signal_centroid() does for the scopes '''
+    def centroids(Y):
+        Y=abs(Y)
+        S=np.sum(Y[...,1:]+Y[...,:-1],axis=-1)
+        XS=np.sum(X[1:]*Y[...,1:]+X[:-1]*Y[...,:-1],axis=-1)
+        return XS/S
+    return centroids(outputs)-centroids(inputs)
     
+def schedule_measurements(model,planned_frequencies,n_new,f_min=None,f_max=None,measured_frequencies=None,
+                          measured_velocities=None,min_spacing=50*10**3,n_grid=20000):
+    ''' returns the n_new frequencies where the next Gaussian packets are the most useful, chosen one after the other on a
+        grid of n_grid frequencies between f_min and f_max ( the bounds of the planned frequencies by default ). A frequency
+        is all the more useful :
+        . as the group velocity predicted by the model is badly rendered by the linear interpolation through the planned
+          frequencies, which happens where it changes fastest ( band edges )
+        . as the measured group velocities ( in m/s, at measured_frequencies ) disagree with the model around it
+        and no frequency closer than min_spacing ( in Hz ) to a planned or chosen frequency is chosen '''
+    planned=np.sort(np.asarray(planned_frequencies,dtype=float))
+    f_min=planned[0] if f_min is None else f_min
+    f_max=planned[-1] if f_max is None else f_max
+    grid=np.linspace(f_min,f_max,n_grid)
+    delays,velocities=model.overall_group_delays(2*np.pi*grid)
+    # The group velocities diverge where the group delays vanish so the scale of the errors is a robust one
+    scale=np.median(abs(velocities))
+    velocities=np.clip(velocities,-10*scale,10*scale)
+    disagreement=np.zeros(n_grid)
+    if measured_frequencies is not None and len(measured_frequencies)>0:
+        order=np.argsort(measured_frequencies)
+        measured_frequencies=np.asarray(measured_frequencies,dtype=float)[order]
+        predicted=np.interp(measured_frequencies,grid,velocities)
+        residuals=abs(np.asarray(measured_velocities,dtype=float)[order]-predicted)
+        disagreement=np.interp(grid,measured_frequencies,residuals)
+    chosen=[]
+    nodes=np.union1d(planned,[f_min,f_max])
+    for i in range(int(n_new)):
+        # Error of the interpolation of the predicted group velocities through the planned and chosen frequencies
+        interpolation_error=abs(velocities-np.interp(grid,nodes,np.interp(nodes,grid,velocities)))
+        # Distance to the closest planned or chosen frequency, the disagreement only mattering away from the measurements
+        k=np.clip(np.searchsorted(nodes,grid),1,len(nodes)-1)
+        distances=np.minimum(abs(grid-nodes[k-1]),abs(grid-nodes[k]))
+        score=interpolation_error+disagreement*distances/(distances+min_spacing)
+        score[distances<min_spacing]=-1
+        best=np.argmax(score)
+        if score[best]<=0:
+            break
+        chosen.append(grid[best])
+        nodes=np.union1d(nodes,[grid[best]])
+    return np.array(chosen)
+
+def decimate_curve(x,y,n_bins=2000):
+    ''' returns the indexes of the points of a curve to keep to draw it : the points are split in n_bins groups of consecutive
+        points and only the first point and the points of minimum and maximum x and y of every group are kept, so that the
+        drawn curve looks the same with at most 5*n_bins points ( missing values being kept to keep the gaps ) '''
+    x=np.asarray(x,dtype=float)
+    y=np.asarray(y,dtype=float)
+    n=x.shape[0]
+    if n<=5*n_bins:
+        return np.arange(n)
+    size=-(-n//n_bins)
+    indexes=[np.arange(0,n,size),[n-1]]
+    for values in (x,y):
+        padded=np.full(n_bins*size,np.nan)
+        padded[:n]=values
+        padded=padded.reshape(n_bins,size)
+        start=np.arange(n_bins)*size
+        indexes.append(start+np.argmin(np.where(np.isnan(padded),np.inf,padded),axis=1))
+        indexes.append(start+np.argmax(np.where(np.isnan(padded),-np.inf,padded),axis=1))
+        indexes.append(start+np.argmax(np.isnan(padded),axis=1))
+    indexes=np.unique(np.concatenate(indexes))
+    return indexes[indexes<n]
+
+def figure_spec(curves,xlabel,ylabel,yscale=None):
+    ''' returns the description of a page of the report : curves is a list of ( x , y , format , label ) drawn with plot() '''
+    return {'curves':curves,'xlabel':xlabel,'ylabel':ylabel,'yscale':yscale}
+
+def build_figure(spec,figsize=(11.69,8.27)):
+    ''' returns the matplotlib Figure of a page of the report described by figure_spec(), built without pyplot so that it
+        doesn't depend on the interactive backend '''
+    fig=Figure(figsize=figsize)
+    ax=fig.add_subplot(111)
+    for x,y,style,label in spec['curves']:
+        ax.plot(x,y,style,label=label)
+    if spec['yscale'] is not None:
+        ax.set_yscale(spec['yscale'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    ax.grid()
+    ax.legend()
+    return fig
+
+def render_page(spec,file_name,rc={}):
+    ''' renders a page of the report into its own pdf file, with the given matplotlib settings '''
+    with matplotlib.rc_context(rc):
+        build_figure(spec).savefig(file_name,format='pdf')
+
+def render_report(specs,file_name,processes=None,n_bins=2000,rc={}):
+    ''' renders all the pages of the report described by specs ( see figure_spec() ) into one pdf file. The dense curves are
+        first decimated with decimate_curve() ( a curve drawn on many pages being decimated once ), the pages are rendered in
+        parallel into separate pdf files by processes worker processes ( all the cores by default ) and these files are then
+        merged, the objects they share like the fonts being only kept once. With a single process, or if the pypdf library
+        isn't installed, the pages are rendered one after the other into a PdfPages file. Returns the time taken in seconds. '''
+    start=time.perf_counter()
+    decimated={}
+    pages=[]
+    for spec in specs:
+        curves=[]
+        for x,y,style,label in spec['curves']:
+            key=(id(x),id(y))
+            if key not in decimated:
+                indexes=decimate_curve(x,y,n_bins)
+                decimated[key]=(np.asarray(x)[indexes],np.asarray(y)[indexes])
+            curves.append(decimated[key]+(style,label))
+        pages.append(dict(spec,curves=curves))
+    processes=processes or os.cpu_count() or 1
+    try:
+        import pypdf
+    except ImportError:
+        pypdf=None
+    if pypdf is None or processes==1 or len(pages)==1:
+        with matplotlib.rc_context(rc),PdfPages(file_name) as pdf:
+            for page in pages:
+                pdf.savefig(build_figure(page))
+        return time.perf_counter()-start
+    directory=tempfile.mkdtemp()
+    try:
+        page_names=[os.path.join(directory,'page_'+str(i).zfill(3)+'.pdf') for i in range(len(pages))]
+        with multiprocessing.Pool(min(processes,len(pages))) as pool:
+            pool.starmap(render_page,[(pages[i],page_names[i],rc) for i in range(len(pages))])
+        writer=pypdf.PdfWriter()
+        for page_name in page_names:
+            writer.append(page_name)
+        if hasattr(writer,'compress_identical_objects'):
+            writer.compress_identical_objects(remove_identicals=True)
+        with open(file_name,'wb') as file:
+            writer.write(file)
+    finally:
+        shutil.rmtree(directory,ignore_errors=True)
+    return time.perf_counter()-start
+
 def constant(name):
     ''' returns constants from a given name in SI units'''
     if name=='c':
@@ -397,318 +1340,230 @@ def constant(name):
 #########################################################################
 
 
-# We first create the frequency/ pulsation range up to 50 MHz
-frequencies=np.linspace(1,50*10**6,num=100000)
-impulsions=2*np.pi*frequencies
-
-# We the, define the 4 media used in the model ( input, output, RG58U and RG59U )
-Input=Medium(impedance=50,name='GBF')
-Output=Medium(impedance=50,name='Termination')
-
-RG58U=Medium(length=5,impedance=50,
-             phase_velocity=0.66*constant('c'),
-             attenuation_function=attenuation_RG58U,
-             name='RG58U')
-RG59U=Medium(length=5,impedance=75,
-             phase_velocity=0.66*constant('c'),
-             attenuation_function=attenuation_RG59U,
-             name='RG59U')
-
-# We the use the Multi_Layered_Media_Model class to create the coaxial model
-Coaxial=Multi_Layered_Media_Model(layers=[RG59U,RG58U],
-                                  build_mode='alternation',
-                                  n_alternation=12,
-                                  input_medium=Input,
-                                  output_medium=Output)
-
-# We finally calculate all the theroetical values by calling all the functions attached to the model
-c_transmissions,c_reflections=Coaxial.overall_transmission(impulsions)
-transmissions,reflections=abs(c_transmissions),abs(c_reflections)
-
-phases=Coaxial.overall_phases()
-phases_shifts=Coaxial.overall_phase_shifts()
-
-indexes=Coaxial.overall_refraction_indexes()
-numbers=Coaxial.overall_wave_numbers()
-velocities=Coaxial.overall_group_velocities()
-
-# We print some useful informations like the model layout and the total length
-print(Coaxial)
-print('Model total length : ',Coaxial.total_length(),' m')
-
-# We then need the useful data to plot them with the theoreatical curves
-#-------------- Article data ----------------#
-# TRANSMISSIONS
-csv2txt('Transmissions article.csv','Transmissions article.txt')
-standarization('Transmissions article.txt')
-LINES=file_reading('Transmissions article.txt')
-AT_Frequencies=[]
-AT_Transmissions=[]
-LINES.pop(0)
-N=len(LINES)
-for i in range(N):
-    if len(LINES[i])>0:
-        line=LINES[i].split(';')
-        AT_Frequencies.append(float(line[0])*10**(6))
-        AT_Transmissions.append(float(line[1]))
-AT_Frequencies=np.array(AT_Frequencies)
-AT_Transmissions=np.array(AT_Transmissions)
-#DISPERSION RELATION
-csv2txt('Dispersion Relation article.csv','Dispersion Relation article.txt')
-standarization('Dispersion Relation article.txt')
-LINES=file_reading('Dispersion Relation article.txt')
-AK_Frequencies=[]
-AK_WaveNumbers=[]
-LINES.pop(0)
-N=len(LINES)
-for i in range(N):
-    if len(LINES[i])>0:
-        line=LINES[i].split(';')
-        AK_Frequencies.append(float(line[0])*10**(6)/(2*np.pi))
-        AK_WaveNumbers.append(float(line[1]))
-AK_Frequencies=np.array(AK_Frequencies)
-AK_WaveNumbers=np.array(AK_WaveNumbers)
-#GROUP VELOCITIES
-csv2txt('Group Velocities article.csv','Group Velocities article.txt')
-standarization('Group Velocities article.txt')
-LINES=file_reading('Group Velocities article.txt')
-AS_Frequencies=[]
-AS_Speeds=[]
-LINES.pop(0)
-N=len(LINES)
-for i in range(N):
-    if len(LINES[i])>0:
-        line=LINES[i].split(';')
-        AS_Frequencies.append(float(line[0])*10**(6))
-        AS_Speeds.append(float(line[1]))
-AS_Frequencies=np.array(AS_Frequencies)
-AS_Speeds=np.array(AS_Speeds)
-#-------------- Experimental data ----------------#
-# TRANSMISSIONS
-csv2txt('Composite Cable Experimental Transmissions.csv','Composite Cable Experimental Transmissions.txt')
-standarization('Composite Cable Experimental Transmissions.txt')
-LINES=file_reading('Composite Cable Experimental Transmissions.txt')
-ET_Frequencies=[]
-ET_Transmissions=[]
-LINES.pop(0)
-LINES.pop(0)
-N=len(LINES)
-for i in range(N):
-    if len(LINES[i])>0:
-        line=LINES[i].split(';')
-        ET_Frequencies.append(float(line[0])*10**(6))
-        ET_Transmissions.append(float(line[2])/float(line[1]))
-ET_Frequencies=np.array(ET_Frequencies)
-ET_Transmissions=np.array(ET_Transmissions)
-# GROUP VELOCITIES
-ES_Speeds=read_float_file('Composite Cable Experimental Group Velocities.txt')
-ES_Frequencies=read_float_file('Composite Cable Experimental Group Velocities Frequencies.txt')
-ES_Speeds=np.array(ES_Speeds)
-ES_Frequencies=np.array(ES_Frequencies)
-
-pdf_save=True
-plt.rcParams.update({'font.size': 21})
-
-if pdf_save:
-    # If pdf_save is True, then we create a pdf called multipage_pdf.pdf containing all the values
-    with PdfPages('multipage_pdf.pdf') as pdf:
-        #------------------TRANSMISSIONS-----------------#
-        # Transmission theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),transmissions,'k',label='Theoretical curve')
-        plt.yscale("log")
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-        
-        # Transmission experimental
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(ET_Frequencies/(10**6),ET_Transmissions,'gx',label='Experimental data')
-        plt.yscale("log")
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Transmission experimental+theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),transmissions,'k',label='Theoretical curve')
-        plt.plot(ET_Frequencies/(10**6),ET_Transmissions,'gx',label='Experimental data')
-        plt.yscale("log")
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Transmission article
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(AT_Frequencies/(10**6),AT_Transmissions,'rx',label='Article data')
-        plt.yscale("log")
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Transmission article+experimental+theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),transmissions,'k',label='Theoretical curve')
-        plt.plot(ET_Frequencies/(10**6),ET_Transmissions,'gx',label='Experimental data')
-        plt.plot(AT_Frequencies/(10**6),AT_Transmissions,'rx',label='Article data')
-        plt.yscale("log")
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Transmission article+experimental
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(ET_Frequencies/(10**6),ET_Transmissions,'gx',label='Experimental data')
-        plt.plot(AT_Frequencies/(10**6),AT_Transmissions,'rx',label='Article data')
+if __name__=='__main__':
+    # The main programm is only run when the file is executed directly, not when worker processes load it
+    # We first create the frequency/ pulsation range up to 50 MHz
+    frequencies=np.linspace(1,50*10**6,num=100000)
+    impulsions=2*np.pi*frequencies
+    # The attenuations of the fitted cable are calculated once on these pulsations
+    attenuation_RG58U.tabulate(impulsions)
+
+    # We the, define the 4 media used in the model ( input, output, RG58U and RG59U )
+    Input=Medium(impedance=50,name='GBF')
+    Output=Medium(impedance=50,name='Termination')
+
+    RG58U=Medium(length=5,impedance=50,
+                 phase_velocity=0.66*constant('c'),
+                 attenuation_function=attenuation_RG58U,
+                 attenuation_derivative=attenuation_derivative_RG58U,
+                 name='RG58U')
+    RG59U=Medium(length=5,impedance=75,
+                 phase_velocity=0.66*constant('c'),
+                 attenuation_function=attenuation_RG59U,
+                 attenuation_derivative=attenuation_derivative_RG59U,
+                 name='RG59U')
+
+    # We the use the Multi_Layered_Media_Model class to create the coaxial model
+    Coaxial=Multi_Layered_Media_Model(layers=[RG59U,RG58U],
+                                      build_mode='alternation',
+                                      n_alternation=12,
+                                      input_medium=Input,
+                                      output_medium=Output)
+
+    # We finally calculate all the theroetical values by calling all the functions attached to the model
+    c_transmissions,c_reflections=Coaxial.overall_transmission(impulsions)
+    transmissions,reflections=abs(c_transmissions),abs(c_reflections)
+
+    phases=Coaxial.overall_phases()
+    phases_shifts=Coaxial.overall_phase_shifts()
+
+    indexes=Coaxial.overall_refraction_indexes()
+    numbers=Coaxial.overall_wave_numbers()
+    velocities=Coaxial.overall_group_velocities()
+
+    # We print some useful informations like the model layout and the total length
+    print(Coaxial)
+    print('Model total length : ',Coaxial.total_length(),' m')
+
+    # If sweep_run is True, we also evaluate the model on a grid of designs using all the local cores
+    sweep_run=False
+    if sweep_run:
+        sweep_parameters={'n_alternation':np.arange(6,13),'RG59U.length':np.linspace(4.5,5.5,11)}
+        sweep_transmissions,sweep_velocities,throughput=parameter_sweep(Coaxial,impulsions[::100],sweep_parameters)
+        print('Parameter sweep throughput : ',throughput,' points/s')
+
+    # If tolerance_run is True, we calculate the 5-95 % bands of |t| and of the group velocities over random realizations
+    # of the cables, checked on a few pulsations against the exact percentiles of the same realizations
+    tolerance_run=False
+    if tolerance_run:
+        t_bands,v_bands=Coaxial.tolerance_analysis(impulsions[::100],n_realizations=1000,seed=0)
+        check_w=impulsions[::5000]
+        streamed=Coaxial.tolerance_analysis(check_w,n_realizations=1000,batch_size=10,seed=0)
+        exact=Coaxial.tolerance_analysis(check_w,n_realizations=1000,batch_size=10,seed=0,exact=True)
+        for q,name in ((0,'| t |'),(1,'group velocity')):
+            error=np.max(abs((streamed[q][2]-streamed[q][0])-(exact[q][2]-exact[q][0]))/abs(exact[q][2]-exact[q][0]))
+            print('Largest relative error of the 5-95 % band of ',name,' : ',error)
+
+    #-------------- Article data ----------------#
+    # TRANSMISSIONS
+    csv2txt('Transmissions article.csv','Transmissions article.txt')
+    standarization('Transmissions article.txt')
+    LINES=file_reading('Transmissions article.txt')
+    AT_Frequencies=[]
+    AT_Transmissions=[]
+    LINES.pop(0)
+    N=len(LINES)
+    for i in range(N):
+        if len(LINES[i])>0:
+            line=LINES[i].split(';')
+            AT_Frequencies.append(float(line[0])*10**(6))
+            AT_Transmissions.append(float(line[1]))
+    AT_Frequencies=np.array(AT_Frequencies)
+    AT_Transmissions=np.array(AT_Transmissions)
+    #DISPERSION RELATION
+    csv2txt('Dispersion Relation article.csv','Dispersion Relation article.txt')
+    standarization('Dispersion Relation article.txt')
+    LINES=file_reading('Dispersion Relation article.txt')
+    AK_Frequencies=[]
+    AK_WaveNumbers=[]
+    LINES.pop(0)
+    N=len(LINES)
+    for i in range(N):
+        if len(LINES[i])>0:
+            line=LINES[i].split(';')
+            AK_Frequencies.append(float(line[0])*10**(6)/(2*np.pi))
+            AK_WaveNumbers.append(float(line[1]))
+    AK_Frequencies=np.array(AK_Frequencies)
+    AK_WaveNumbers=np.array(AK_WaveNumbers)
+    #GROUP VELOCITIES
+    csv2txt('Group Velocities article.csv','Group Velocities article.txt')
+    standarization('Group Velocities article.txt')
+    LINES=file_reading('Group Velocities article.txt')
+    AS_Frequencies=[]
+    AS_Speeds=[]
+    LINES.pop(0)
+    N=len(LINES)
+    for i in range(N):
+        if len(LINES[i])>0:
+            line=LINES[i].split(';')
+            AS_Frequencies.append(float(line[0])*10**(6))
+            AS_Speeds.append(float(line[1]))
+    AS_Frequencies=np.array(AS_Frequencies)
+    AS_Speeds=np.array(AS_Speeds)
+    #-------------- Experimental data ----------------#
+    # TRANSMISSIONS
+    csv2txt('Composite Cable Experimental Transmissions.csv','Composite Cable Experimental Transmissions.txt')
+    standarization('Composite Cable Experimental Transmissions.txt')
+    LINES=file_reading('Composite Cable Experimental Transmissions.txt')
+    ET_Frequencies=[]
+    ET_Transmissions=[]
+    LINES.pop(0)
+    LINES.pop(0)
+    N=len(LINES)
+    for i in range(N):
+        if len(LINES[i])>0:
+            line=LINES[i].split(';')
+            ET_Frequencies.append(float(line[0])*10**(6))
+            ET_Transmissions.append(float(line[2])/float(line[1]))
+    ET_Frequencies=np.array(ET_Frequencies)
+    ET_Transmissions=np.array(ET_Transmissions)
+    # GROUP VELOCITIES
+    ES_Speeds=read_float_file('Composite Cable Experimental Group Velocities.txt')
+    ES_Frequencies=read_float_file('Composite Cable Experimental Group Velocities Frequencies.txt')
+    ES_Speeds=np.array(ES_Speeds)
+    ES_Frequencies=np.array(ES_Frequencies)
+
+    # If packets_run is True, we simulate the Gaussian packets sent to the crystal and their group velocities
+    packets_run=False
+    if packets_run:
+        # The frequencies are read through a Frequency_Plan to get the ones still in the log of the file
+        import sys
+        sys.path.insert(0,os.path.join(directory,'Gaussian_Packets_Creation'))
+        from frequencies_management import Frequency_Plan
+        packets_frequencies=np.array(Frequency_Plan(os.path.join(directory,'Gaussian_Packets_Creation','frequencies.txt')).frequencies())
+        X,packets=gaussian_packets(packets_frequencies)
+        outputs=simulate_packets(Coaxial,X,packets)
+        packets_speeds=(Coaxial.total_length()/centroid_delays(X,packets,outputs))/constant('c')
+        print('Simulated group velocities ( in units of c ) : ',packets_speeds)
+
+    # If fit_run is True, we fit the lengths, impedances and velocity factors of the cables on the experimental transmissions
+    fit_run=False
+    if fit_run:
+        fitted_media,covariance,names=Coaxial.fit_transmissions(2*np.pi*ET_Frequencies,ET_Transmissions)
+        for medium in fitted_media:
+            print(medium.name,' : length = ',medium.length,' m, impedance = ',medium.impedance,' Ohm, velocity factor = ',medium.phase_velocity/constant('c'))
+        print('Standard deviations : ',dict(zip(names,np.sqrt(np.diag(covariance)))))
+
+    # If schedule_run is True, we choose the next frequencies to measure where the model predicts the fastest changes of the
+    # group velocity or disagrees with the measurements, and add them to the frequencies of the Gaussian packets
+    schedule_run=False
+    if schedule_run:
+        import sys
+        sys.path.insert(0,os.path.join(directory,'Gaussian_Packets_Creation'))
+        from frequencies_management import Frequency_Plan
+        with Frequency_Plan(os.path.join(directory,'Gaussian_Packets_Creation','frequencies.txt')) as plan:
+            next_frequencies=schedule_measurements(Coaxial,plan.frequencies(),20,
+                                                   measured_frequencies=ES_Frequencies,
+                                                   measured_velocities=ES_Speeds*constant('c'))
+            print('Next frequencies to measure ( MHz ) : ',np.array(plan.insert(next_frequencies))/10**6)
+
+    pdf_save=True
+    plt.rcParams.update({'font.size': 21})
+
+    if pdf_save:
+        # If pdf_save is True, then we create a pdf called multipage_pdf.pdf containing all the values, every page being
+        # described below and all the pages being rendered in parallel by render_report()
+        F=frequencies/(10**6)
+        theory_t=(F,transmissions,'k','Theoretical curve')
+        experiment_t=(ET_Frequencies/(10**6),ET_Transmissions,'gx','Experimental data')
+        article_t=(AT_Frequencies/(10**6),AT_Transmissions,'rx','Article data')
+        theory_k=(numbers,F,'k','Theoretical curve')
+        article_k=(AK_WaveNumbers,AK_Frequencies/(10**6),'rx','Article data')
+        theory_v=(F,velocities/constant('c'),'k','Theoretical curve')
+        experiment_v=(ES_Frequencies/(10**6),ES_Speeds,'gx','Experimental data')
+        article_v=(AS_Frequencies/(10**6),AS_Speeds,'rx','Article data')
+        specs=[#------------------TRANSMISSIONS-----------------#
+               figure_spec([theory_t],'frequency (MHz)','| t |','log'),
+               figure_spec([experiment_t],'frequency (MHz)','| t |','log'),
+               figure_spec([theory_t,experiment_t],'frequency (MHz)','| t |','log'),
+               figure_spec([article_t],'frequency (MHz)','| t |','log'),
+               figure_spec([theory_t,experiment_t,article_t],'frequency (MHz)','| t |','log'),
+               figure_spec([experiment_t,article_t],'frequency (MHz)','| t |','log'),
+               figure_spec([(F,(phases*360)/(2*np.pi),'k','Theoretical curve')],'frequency (MHz)','phases (°)'),
+               figure_spec([(F,(phases_shifts*360)/(2*np.pi),'k','Theoretical curve')],'frequency (MHz)','phase shifts (°)'),
+               figure_spec([(F,indexes,'k','Theoretical curve')],'frequency (MHz)','refraction index'),
+               #------------------DISPERSION RELATION-----------------#
+               figure_spec([theory_k],'k ( m^-1)','frequency (MHz)'),
+               figure_spec([theory_k,article_k],'k ( m^-1)','frequency (MHz)'),
+               #------------------GROUP VELOCITIES-----------------#
+               figure_spec([theory_v],'frequency (MHz)','group velocity ( in units of c )'),
+               figure_spec([experiment_v],'frequency (MHz)','group velocity ( in units of c )'),
+               figure_spec([theory_v,experiment_v],'frequency (MHz)','group velocity ( in units of c )'),
+               figure_spec([experiment_v,article_v],'frequency (MHz)','group velocity ( in units of c )'),
+               figure_spec([theory_v,experiment_v,article_v],'frequency (MHz)','group velocity ( in units of c )')]
+        duration=render_report(specs,'multipage_pdf.pdf',rc={'font.size':21})
+        print('Report rendered in ',duration,' s')
+
+    else:
+        # If pdf_save is False, we then just plot the values calculated earlier
+        fig=plt.figure() # We define the figure
+
+        ax1=fig.add_subplot(131)
+        ax1.plot(frequencies/(10**6),transmissions)
         plt.yscale("log")
         plt.xlabel('frequency (MHz)')
         plt.ylabel('| t |')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
 
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),(phases*360)/(2*np.pi),'k',label='Theoretical curve')
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('phases (°)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),(phases_shifts*360)/(2*np.pi),'k',label='Theoretical curve')
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('phase shifts (°)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),indexes,'k',label='Theoretical curve')
-        plt.xlabel('frequency (MHz)')
-        plt.ylabel('refraction index')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-        
-        #------------------DISPERSION RELATION-----------------#
-        # Dispersion relation theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(numbers,frequencies/(10**6),'k',label='Theoretical curve')
-        plt.ylabel('frequency (MHz)')
-        plt.xlabel('k ( m^-1)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Dispersion relation article+theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(numbers,frequencies/(10**6),'k',label='Theoretical curve')
-        plt.plot(AK_WaveNumbers,AK_Frequencies/(10**6),'rx',label='Article data')
+        ax2=fig.add_subplot(132)
+        ax2.plot(numbers,frequencies/(10**6))
         plt.ylabel('frequency (MHz)')
-        plt.xlabel('k ( m^-1)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        #------------------GROUP VELOCITIES-----------------#
-        # Group velocities theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),velocities/constant('c'),'k',label='Theoretical curve')
-        plt.ylabel('group velocity ( in units of c )')
-        plt.xlabel('frequency (MHz)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Group velocities experimental
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(ES_Frequencies/(10**6),ES_Speeds,'gx',label='Experimental data')
-        plt.ylabel('group velocity ( in units of c )')
-        plt.xlabel('frequency (MHz)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Group velocities experimental+theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),velocities/constant('c'),'k',label='Theoretical curve')
-        plt.plot(ES_Frequencies/(10**6),ES_Speeds,'gx',label='Experimental data')
-        plt.ylabel('group velocity ( in units of c )')
-        plt.xlabel('frequency (MHz)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Group velocities article+experimental
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(ES_Frequencies/(10**6),ES_Speeds,'gx',label='Experimental data')
-        plt.plot(AS_Frequencies/(10**6),AS_Speeds,'rx',label='Article data')
-        plt.ylabel('group velocity ( in units of c )')
-        plt.xlabel('frequency (MHz)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
-
-        # Group velocities article+experimental+theoretical
-        fig = plt.figure(figsize=(11.69,8.27))
-        plt.plot(frequencies/(10**6),velocities/constant('c'),'k',label='Theoretical curve')
-        plt.plot(ES_Frequencies/(10**6),ES_Speeds,'gx',label='Experimental data')
-        plt.plot(AS_Frequencies/(10**6),AS_Speeds,'rx',label='Article data')
-        plt.ylabel('group velocity ( in units of c )')
-        plt.xlabel('frequency (MHz)')
-        plt.grid()
-        plt.legend()
-        pdf.savefig(fig)
-        plt.close()
+        plt.xlabel('k ( m^-1 )')
 
+        ax3=fig.add_subplot(133)
+        ax3.plot(frequencies/(10**6),velocities/constant('c'))
+        plt.ylabel('group velocity ( units of c )')
+        plt.xlabel('frequency (MHz)')
 
-        
-else:
-    # If pdf_save is False, we then just plot the values calculated earlier
-    fig=plt.figure() # We define the figure
-
-    ax1=fig.add_subplot(131)
-    ax1.plot(frequencies/(10**6),transmissions)
-    plt.yscale("log")
-    plt.xlabel('frequency (MHz)')
-    plt.ylabel('| t |')
-
-    ax2=fig.add_subplot(132)
-    ax2.plot(numbers,frequencies/(10**6))
-    plt.ylabel('frequency (MHz)')
-    plt.xlabel('k ( m^-1 )')
-
-    ax3=fig.add_subplot(133)
-    ax3.plot(frequencies/(10**6),velocities/constant('c'))
-    plt.ylabel('group velocity ( units of c )')
-    plt.xlabel('frequency (MHz)')
-
-    plt.show()# We show the figure
+        plt.show()# We show the figure
              
     
@@ -20,6 +20,15 @@
 #########################################################################
 
 import numpy as np
+import os
+import bisect
+import tempfile
+# The locks of the files are taken with fcntl on Linux and MacOS and with msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl=None
+    import msvcrt
 
 # FUNCTIONS -------------------------------------------------------------
 
@@ -48,12 +57,22 @@ def write_float_file(file_name,content):
     '''
     This function takes as input a file name and some content in a list then writes the content
     of this list into the file mentionned, deleting all previous content of the file in the process.
+    The content is first written into a temporary file of a unique name, next to the file, that then replaces the file
+    at once, so that other programms reading the file never see it half written.
     '''
     N=len(content)
-    with open(file_name,'w') as file:
-        for i in range(N):
-            file.write(str(float(content[i]))+'\n')
-        file.close()
+    directory=os.path.dirname(os.path.abspath(file_name))
+    descriptor,temporary_name=tempfile.mkstemp(prefix=os.path.basename(file_name)+'.',suffix='.tmp',dir=directory)
+    try:
+        with os.fdopen(descriptor,'w') as file:
+            file.write(''.join(str(float(content[i]))+'\n' for i in range(N)))
+        # mkstemp() creates the file readable by its owner only, the file keeps the rights of the one it replaces
+        os.chmod(temporary_name,os.stat(file_name).st_mode if os.path.exists(file_name) else 0o644)
+        os.replace(temporary_name,file_name)
+    except BaseException:
+        if os.path.exists(temporary_name):
+            os.remove(temporary_name)
+        raise
 
 
 def initial_frequencies(fi=5*10**6,ff=50*10**6,N=91):
@@ -64,15 +83,199 @@ def initial_frequencies(fi=5*10**6,ff=50*10**6,N=91):
     F=np.linspace(fi,ff,num=int(N))
     write_float_file('frequencies.txt',F)
 
-def add_frequency(new_frequency):
+class File_Lock:
+    '''
+    This class is an exclusive lock between programms, taken on a lock file while in a with block. The lock can be taken
+    again by the same object inside the block ( only the outermost block takes and releases it ).
+    '''
+    def __init__(self,file_name):
+        self.file_name=file_name
+        self.depth=0
+
+    def __enter__(self):
+        if self.depth==0:
+            self.file=open(self.file_name,'a+')
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(),fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(),msvcrt.LK_LOCK,1)
+        self.depth+=1
+        return self
+
+    def __exit__(self,*exception):
+        self.depth-=1
+        if self.depth==0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(),fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(),msvcrt.LK_UNLCK,1)
+            self.file.close()
+
+class Frequency_Plan:
+    '''
+    This class manages a frequencies file without rewriting it for every change. The frequencies are kept in the order
+    of the file ( which is the order of the indexes of the Gaussian packets files ) along with a sorted index where
+    the duplicates are searched by dichotomy ( O(log n) ), two frequencies closer than tolerance ( in Hz ) being the same.
+    Inserting in or removing from the sorted index is a single memory move of the list, O(n) but very fast compared with
+    rewriting the file.
+    Every addition or removal is appended to a log file ( file_name+'.log' ) and the frequencies file is only rewritten,
+    at once, when the log holds at least compaction_size changes or when compact() is called. Until then the frequencies
+    file doesn't hold the changes of the log, so the programms reading the frequencies should read them through a
+    Frequency_Plan ( which replays the log ) or call compact() first.
+    Many programms can use the same frequencies file at the same time : reading, appending to the log and compacting are
+    done under an exclusive lock on file_name+'.lock', and the changes made by the other programms are read again before
+    every change, so that none is lost. Between two changes, the plan is the one read at its last change.
+    '''
+    def __init__(self,file_name='frequencies.txt',tolerance=1.0,compaction_size=1000):
+        self.file_name=file_name
+        self.log_name=file_name+'.log'
+        self.lock=File_Lock(file_name+'.lock')
+        self.tolerance=tolerance
+        self.compaction_size=compaction_size
+        # Frequencies in the order of the file ( dictionnaries keep the insertion order ) and sorted index
+        self.plan={}
+        self.index=[]
+        # Number of changes and of bytes of the log already replayed, and state of the frequencies file they apply to
+        self.log_size=0
+        self.log_offset=0
+        self.file_state=None
+        with self.lock:
+            self.synchronize()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exception):
+        # The log is already written, the frequencies file is only rewritten when the log is long enough
+        if self.log_size>=self.compaction_size:
+            self.compact()
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __contains__(self,frequency):
+        return self.find(frequency) is not None
+
+    def frequencies(self):
+        ''' returns the frequencies in the order of the file '''
+        return list(self.plan.keys())
+
+    def find(self,frequency):
+        ''' returns the frequency of the plan closer than tolerance to the given frequency ( None if there is none ) '''
+        k=bisect.bisect_left(self.index,frequency)
+        candidates=[self.index[j] for j in (k-1,k) if 0<=j<len(self.index)]
+        if len(candidates)==0:
+            return None
+        closest=min(candidates,key=lambda f:abs(f-frequency))
+        return closest if abs(closest-frequency)<=self.tolerance else None
+
+    def synchronize(self):
+        # Called under the lock : the frequencies file is read again if another programm rewrote it ( a new file
+        # replaces it at every compaction ), then the changes appended to the log since the last call are replayed
+        state=None
+        if os.path.exists(self.file_name):
+            stat=os.stat(self.file_name)
+            state=(stat.st_ino,stat.st_size,stat.st_mtime_ns)
+        if state!=self.file_state:
+            self.plan={}
+            self.index=[]
+            self.log_size=0
+            self.log_offset=0
+            self.file_state=state
+            if state is not None:
+                self.insert(read_float_file(self.file_name),log=False)
+        if not os.path.exists(self.log_name):
+            return
+        with open(self.log_name,'rb') as file:
+            file.seek(self.log_offset)
+            data=file.read()
+        # A last line without its end of line is still being written ( or was never finished ) and is ignored
+        data=data[:data.rfind(b'\n')+1]
+        for line in data.decode().splitlines():
+            if line.startswith('+'):
+                self.insert([float(line[1:])],log=False)
+            elif line.startswith('-'):
+                self.remove([float(line[1:])],log=False)
+            self.log_size+=1
+        self.log_offset+=len(data)
+
+    def insert(self,frequencies,log=True):
+        ''' adds the given frequencies at the end of the plan, the ones already in the plan ( up to tolerance ) being
+            skipped, and returns the list of the frequencies added '''
+        if log:
+            with self.lock:
+                self.synchronize()
+                added=self.insert(frequencies,log=False)
+                self.write_log('+',added)
+            return added
+        added=[]
+        for frequency in frequencies:
+            frequency=float(frequency)
+            if self.find(frequency) is None:
+                bisect.insort(self.index,frequency)
+                self.plan[frequency]=None
+                added.append(frequency)
+        return added
+
+    def remove(self,frequencies,log=True):
+        ''' removes the frequencies of the plan closer than tolerance to the given frequencies and returns them '''
+        if log:
+            with self.lock:
+                self.synchronize()
+                removed=self.remove(frequencies,log=False)
+                self.write_log('-',removed)
+            return removed
+        removed=[]
+        for frequency in frequencies:
+            found=self.find(float(frequency))
+            if found is not None:
+                del self.index[bisect.bisect_left(self.index,found)]
+                del self.plan[found]
+                removed.append(found)
+        return removed
+
+    def write_log(self,sign,frequencies):
+        # Called under the lock, all the changes of a call are appended with a single write
+        if len(frequencies)==0:
+            return
+        data=''.join(sign+repr(frequency)+'\n' for frequency in frequencies).encode()
+        with open(self.log_name,'ab') as file:
+            # An unfinished last line left by a programm stopped while writing is replaced
+            if file.tell()>self.log_offset:
+                file.truncate(self.log_offset)
+            file.write(data)
+        self.log_size+=len(frequencies)
+        self.log_offset+=len(data)
+        if self.log_size>=self.compaction_size:
+            self.compact()
+
+    def compact(self):
+        ''' rewrites the frequencies file at once with all the changes and removes them from the log '''
+        with self.lock:
+            self.synchronize()
+            write_float_file(self.file_name,self.frequencies())
+            stat=os.stat(self.file_name)
+            self.file_state=(stat.st_ino,stat.st_size,stat.st_mtime_ns)
+            # Only the changes written in the frequencies file are removed, an unfinished last line is kept
+            if os.path.exists(self.log_name):
+                with open(self.log_name,'r+b') as file:
+                    file.seek(self.log_offset)
+                    rest=file.read()
+                    file.seek(0)
+                    file.write(rest)
+                    file.truncate()
+            self.log_size=0
+            self.log_offset=0
+
+def add_frequency(new_frequency,file_name='frequencies.txt',tolerance=1.0):
     '''
-    This function lets us add a frequency in the file by reading all the previous content, storing it,
-    adding the frequency at the end of the obtained list( and checking for any duplicate ) and
-    rewriting all the content of the file, closing it afterwards.
+    This function lets us add a frequency at the end of the file, if the file doesn't already hold it ( up to
+    tolerance, in Hz ), using a Frequency_Plan : the frequency is only appended to the log of the file, which is rewritten
+    once the log is long enough. The file and its log are still read to look for duplicates, so to add many frequencies
+    at once a Frequency_Plan should rather be used directly.
     '''
-    frequencies=read_float_file('frequencies.txt')
-    if new_frequency not in frequencies:
-        frequencies.append(new_frequency)
-        write_float_file('frequencies.txt',frequencies)
-    else:
-        print("frequency already in file, not added once more")
+    with Frequency_Plan(file_name,tolerance) as plan:
+        if len(plan.insert([new_frequency]))==0:
+            print("frequency already in file, not added once more")
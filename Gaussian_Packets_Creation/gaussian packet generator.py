@@ -7,8 +7,8 @@
 #   ones we carefully chose.                                            #
 #                                                                       #
 #   This programm is coded in Python language and needs special         #
-#   libraries to work. Especially Numpy, Matplotlib and Csv libraries   #
-#   are necessary and the programm can't work without them.             #  
+#   libraries to work. Especially Numpy, Matplotlib and Concurrent      #
+#   libraries are necessary and the programm can't work without them.   #
 #                                                                       #
 #########################################################################
 
@@ -24,7 +24,8 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-import csv
+import concurrent.futures
+from frequencies_management import Frequency_Plan
 
 # FUNCTIONS -------------------------------------------------------------
 
@@ -36,6 +37,65 @@ def Gauss_function(x,mu,sigma):
     '''
     return (1/(sigma*np.sqrt(2*np.pi)))*np.exp(-(x-mu)**2/(2*sigma**2))
 
+def Gaussian_packets(fw,frequencies,width,fGBF,Amplitude):
+    '''
+    This function generates the Gaussian packets of all the given frequencies at once, as an array of shape
+    ( len(frequencies) , N ) with N the number of points of a packet. Every packet is the product of the same
+    Gaussian function, computed only once, and of a sin function with a period of 1/f0 ( see create_file_Gaussian() ).
+    It returns the time axis X and the array of the packets.
+    '''
+    N=int(fGBF/fw)
+    Tw=1/fw
+    X=np.linspace(-Tw/2,Tw/2,num=N)
+    Sinusoids=np.sin(2*np.pi*np.asarray(frequencies,dtype=float)[:,np.newaxis]*X)
+    Gaussian=Gauss_function(X,0,width)
+    G0=Gauss_function(0,0,width)
+    Y=(Gaussian*Amplitude)*Sinusoids/G0
+    return X,Y
+
+def format_values(Y,decimals):
+    '''
+    This function formats all the values of Y at once as lines of text with a fixed number of decimals, for example
+    -1.234567890 or 0.000012345, each line ending with '\\r\\n', and returns the bytes of all the lines.
+    The digits are computed with integer operations on the whole array and the leading zeros and unneeded signs
+    are then removed with a mask, without formatting the values one by one.
+    '''
+    Y=np.asarray(Y,dtype=float).ravel()
+    q=np.round(abs(Y)*10**decimals).astype(np.int64)
+    n_integer=max(1,len(str(int(q.max())//10**decimals)) if q.size else 1)
+    width=1+n_integer+1+decimals+2
+    chars=np.empty((Y.size,width),dtype=np.uint8)
+    chars[:,0]=ord('-')
+    powers=10**np.arange(n_integer+decimals-1,-1,-1,dtype=np.int64)
+    digits=(q[:,np.newaxis]//powers)%10+ord('0')
+    chars[:,1:1+n_integer]=digits[:,:n_integer]
+    chars[:,1+n_integer]=ord('.')
+    chars[:,2+n_integer:width-2]=digits[:,n_integer:]
+    chars[:,width-2]=ord('\r')
+    chars[:,width-1]=ord('\n')
+    mask=np.ones((Y.size,width),dtype=bool)
+    # The sign is only kept for the negative values that are not rounded to zero
+    mask[:,0]=(Y<0)&(q>0)
+    # The leading zeros of the integer part are removed, keeping at least one digit before the point
+    integer_part=q//10**decimals
+    for k in range(n_integer-1):
+        mask[:,1+k]=integer_part>=10**(n_integer-1-k)
+    return chars[mask].tobytes()
+
+def write_packet_file(Y,name,decimals=None):
+    '''
+    This function writes a Gaussian packet Y in a csv file readable by the GBF, one value per line.
+    With decimals=None the values are written with all their digits, exactly like with str(), and otherwise all the
+    lines are preformatted at once with that number of decimals by format_values(), which is much faster.
+    Either way the file is written with a single write.
+    '''
+    if decimals is None:
+        with open(name,'w',newline='') as csvfile:
+            csvfile.write('\r\n'.join(map(str,Y.tolist()))+'\r\n')
+    else:
+        with open(name,'wb') as csvfile:
+            csvfile.write(format_values(Y,decimals))
+
 def create_file_Gaussian(fw,f0,width,fGBF,Amplitude,name):
     '''
     This function creates a csv file containing a Gaussian packet. The packet is put in the middle of an interval
@@ -46,17 +106,65 @@ def create_file_Gaussian(fw,f0,width,fGBF,Amplitude,name):
     The Gaussian packet is created with a number of points generated specifically for the sampling
     frequency of the GBF expected to read the file.
     '''
-    N=int(fGBF/fw)
-    Tw=1/fw
-    X=np.linspace(-Tw/2,Tw/2,num=N)
-    Sinusoid=np.sin(2*np.pi*f0*X)
-    Gaussian=Gauss_function(X,0,width)
-    G0=Gauss_function(0,0,width)
-    Y=Gaussian*Amplitude*Sinusoid/G0
-    with open(name, 'w', newline='') as csvfile:
-        float_writer = csv.writer(csvfile, delimiter=' ',quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        for i in range(N):
-            float_writer.writerow([str(Y[i])])
+    X,Y=Gaussian_packets(fw,[f0],width,fGBF,Amplitude)
+    write_packet_file(Y[0],name)
+
+def create_files_Gaussian(fw,frequencies,width,fGBF,Amplitude,names,decimals=9,threads=None):
+    '''
+    This function creates the csv files of the Gaussian packets of all the given frequencies, with the given names.
+    The packets are all generated at once by Gaussian_packets() and the files are then written by a pool of threads
+    ( threads=1 writes them one after the other ) with the given number of decimals ( see write_packet_file() ).
+    '''
+    X,Y=Gaussian_packets(fw,frequencies,width,fGBF,Amplitude)
+    if threads==1:
+        for i in range(len(names)):
+            write_packet_file(Y[i],names[i],decimals)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            list(executor.map(write_packet_file,Y,names,[decimals]*len(names)))
+
+def quantize_packet(Y,Amplitude,bits=14):
+    '''
+    This function quantizes a Gaussian packet Y like the digital to analog converter of the GBF does : the values from
+    -Amplitude to Amplitude are mapped on the signed integers from -(2**(bits-1)-1) to 2**(bits-1)-1.
+    It returns the integer codes and the quantization error as a dictionnary giving its maximum and its root mean
+    square ( in the same unit as Y ) and the signal to quantization noise ratio in dB.
+    '''
+    full_scale=2**(bits-1)-1
+    codes=np.clip(np.round(np.asarray(Y)*full_scale/Amplitude),-full_scale,full_scale).astype(np.int16 if bits<=16 else np.int32)
+    error=np.asarray(Y)-codes.astype(float)*Amplitude/full_scale
+    rms_error=np.sqrt(np.mean(error**2))
+    rms_signal=np.sqrt(np.mean(np.asarray(Y)**2))
+    return codes,{'max':np.max(abs(error)),'rms':rms_error,'SNR':20*np.log10(rms_signal/rms_error) if rms_error>0 else np.inf}
+
+def export_packet(Y,name,Amplitude,bits=14,form='integers'):
+    '''
+    This function exports a Gaussian packet Y quantized by quantize_packet() in a compact file for the GBF :
+    . form='integers' writes the integer codes as text, one per line
+    . form='binary' writes the integer codes as little endian 16 bits ( or 32 bits above 16 bits of resolution ) integers
+    It returns the quantization error given by quantize_packet().
+    '''
+    assert form in ('integers','binary'),"Unknown export form : "+str(form)
+    codes,error=quantize_packet(Y,Amplitude,bits)
+    if form=='integers':
+        with open(name,'w',newline='') as file:
+            file.write('\r\n'.join(map(str,codes.tolist()))+'\r\n')
+    else:
+        with open(name,'wb') as file:
+            file.write(codes.astype(codes.dtype.newbyteorder('<')).tobytes())
+    return error
+
+def export_files_Gaussian(fw,frequencies,width,fGBF,Amplitude,names,bits=14,form='integers',threads=None):
+    '''
+    This function does the same as create_files_Gaussian() but exports the quantized packets with export_packet().
+    It returns the list of the quantization errors of all the packets.
+    '''
+    X,Y=Gaussian_packets(fw,frequencies,width,fGBF,Amplitude)
+    export=lambda Y,name:export_packet(Y,name,Amplitude,bits,form)
+    if threads==1:
+        return [export(Y[i],names[i]) for i in range(len(names))]
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(export,Y,names))
 
 def name(f,i,n):
     '''
@@ -74,23 +182,32 @@ def name(f,i,n):
     return "Gaussian_Packet_"+num+"_"+str(f)+".csv"
 
 
-# We first mention the Gaussian packet outer frequency ( the frequency at which the packest will appear )
-fw=10000
+if __name__=='__main__':
+    # We first mention the Gaussian packet outer frequency ( the frequency at which the packest will appear )
+    fw=10000
+
+    # We then need to mention the sampling frequency of the GBF and the width of the Gaussian packets
+    width=4*10**(-6)
+    fGBF=200*10**6
 
-# We then need to mention the sampling frequency of the GBF and the width of the Gaussian packets
-width=4*10**(-6)
-fGBF=200*10**6
+    # We then extract the frequencies we want from the 'frequencies.txt' file containing them all, along with the ones
+    # added to its log and not yet written into it
+    frequencies=Frequency_Plan('frequencies.txt').frequencies()
 
-# We then extract the frequencies we want from the 'frequencies.txt' file containing them all
-frequencies=[]
-with open('frequencies.txt','r') as file:
-    LINES=file.readlines()
-    N=len(LINES)
-    for k in range(N):
-        frequencies.append(float(LINES[k]))
-    file.close()
+    # Then we use all the functions defined above to generate all the packets at once and write a csv file for every
+    # frequency extracted just above, the values being written with 9 decimals ( far below the resolution of the GBF,
+    # decimals=None writing them with all their digits )
+    N=len(frequencies)
+    create_files_Gaussian(fw,frequencies,width,fGBF,10,[name(frequencies[i],i,1000) for i in range(N)],decimals=9)
 
-# Then we use all the functions defined above to generate a csv file for every frequency extracted just above
-N=len(frequencies)
-for i in range(int(N)):
-    create_file_Gaussian(fw,frequencies[i],width,fGBF,10,name(frequencies[i],i,1000))
+    # The packets can also be exported quantized to the resolution of the DAC of the GBF, either as integers written as
+    # text ( export_form='integers' ) or as a binary file of 16 bits integers ( export_form='binary' ), which are much
+    # smaller and faster to send to the GBF
+    export_form=None
+    bits=14
+    if export_form is not None:
+        extension='.txt' if export_form=='integers' else '.bin'
+        names=[name(frequencies[i],i,1000)[:-4]+extension for i in range(N)]
+        errors=export_files_Gaussian(fw,frequencies,width,fGBF,10,names,bits,export_form)
+        print('Maximum quantization error : ',max(error['max'] for error in errors),' V')
+        print('Lowest signal to quantization noise ratio : ',min(error['SNR'] for error in errors),' dB')
@@ -9,9 +9,10 @@
 #   the group velocity of the Gaussian packet through the model.        #
 #                                                                       #
 #   This programm is coded in Python language and needs special         #
-#   libraries to work. Especially Numpy, Matplotlib, Os and Csv         #
-#   libraries are necessary and the programm can't work without         #
-#   them.                                                               #
+#   libraries to work. Especially Numpy, Matplotlib and Os libraries    #
+#   are necessary and the programm can't work without them.             #
+#   It can also run live, watching the directory where the scopes are   #
+#   saved during the acquisition with the Asyncio library.              #
 #                                                                       #
 #########################################################################
 
@@ -25,10 +26,15 @@
 #                                                                       #
 #########################################################################
 
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import hashlib
+import functools
+import multiprocessing
+import asyncio
+import concurrent.futures
+import time
 
 
 
@@ -55,16 +61,17 @@ def name_file(file_name):
     return file[0]
 
 def trapeze_method(X,Y):
-    ''' From two lists X and Y with Y = f(X), calculate an approximation of the area below the curve of f
+    ''' From two arrays X and Y with Y = f(X), calculate an approximation of the area below the curve of f
         on the interval [ X[0] , X[-1] ] by using the trapezes method of integral calculation.
+        The trapezes are summed along the last axis so that many curves can be integrated at once, and X may be
+        non-uniform. Trapezes touching a NaN value of X or Y are left out.
     '''
-    assert len(X)==len(Y)
-    dX=X[1]-X[0]
-    N=len(X)
-    S=0
-    for i in range(N-1):
-        S=S+(Y[i+1]+Y[i])*dX/2 # We each time add a little trapeze between X[i+1] and X[i]
-    return S
+    X=np.asarray(X,dtype=float)
+    Y=np.asarray(Y,dtype=float)
+    assert X.shape[-1]==Y.shape[-1]
+    dX=np.diff(X,axis=-1)
+    trapezes=(Y[...,1:]+Y[...,:-1])*dX/2 # The little trapezes between X[i+1] and X[i]
+    return np.sum(np.where(np.isnan(trapezes),0,trapezes),axis=-1)
  
 def is_file(file_name):
     ''' This function returns True if the input is a file. It does that by checking for extensions which
@@ -79,18 +86,274 @@ def signal_centroid(X,Y):
     ''' This function returns the x position of the centroid of a signal inputes through the Y list of points
         associated with X. '''
     assert len(X)==len(Y)
-    XY=X*abs(Y)
-    ES=trapeze_method(X,abs(Y))
-    tES=trapeze_method(X,XY)
-    center=tES/ES
-    return center
-            
+    return signal_centroids(X,Y)
+
+def signal_centroids(X,Y):
+    ''' This function returns the x positions of the centroids of many signals at once. Y is an array whose last axis
+        holds the points of the signals ( for example of shape ( number of scopes , 2 channels , number of samples ) ) and
+        X the associated time axes, broadcastable to Y and possibly non-uniform. Missing samples ( NaN values ) are masked :
+        the trapezes touching them are left out of both integrals of |Y| and X*|Y|.
+    '''
+    X=np.asarray(X,dtype=float)
+    A=abs(np.asarray(Y,dtype=float))
+    X,A=np.broadcast_arrays(X,A)
+    A=np.where(np.isnan(X),np.nan,A)
+    ES=trapeze_method(X,A)
+    tES=trapeze_method(X,X*A)
+    return tES/ES
+
+def hilbert_envelopes(Y):
+    ''' This function returns the envelopes of many signals at once ( along the last axis of Y ), as the modulus of their
+        analytic signals obtained with the Hilbert transform computed by FFT. Missing samples ( NaN ) are taken as zeros.
+    '''
+    Y=np.where(np.isnan(Y),0,Y)
+    n=Y.shape[-1]
+    h=np.zeros(n)
+    h[0]=1
+    h[1:(n+1)//2]=2
+    if n%2==0:
+        h[n//2]=1
+    return abs(np.fft.ifft(np.fft.fft(Y,axis=-1)*h,axis=-1))
+
+def cross_correlation_delays(X,Y1,Y2,envelope=False):
+    ''' This function returns the delays of the signals Y2 relative to the signals Y1 ( arrays of shape ( number of scopes ,
+        number of samples ) on uniform time axes X ) given by the maximum of their cross-correlations. The cross-correlations
+        are computed for all the scopes at once by zero-padded FFTs and the maximum is refined below the sampling step by
+        fitting a parabola on the three points around it. If envelope is True the Hilbert envelopes are correlated rather
+        than the signals themselves. Missing samples ( NaN ) are taken as zeros.
+        Correlating the signals themselves is only valid when the carrier is well sampled ( many samples per period ) :
+        otherwise the peaks of the correlation one carrier period apart are about as high and the maximum often lands on
+        the wrong one. With our scopes ( 40 MS/s ) and carriers of 5 to 50 MHz, the envelopes must be correlated.
+    '''
+    X=np.atleast_2d(X)
+    Y1=np.atleast_2d(np.where(np.isnan(Y1),0,Y1))
+    Y2=np.atleast_2d(np.where(np.isnan(Y2),0,Y2))
+    if envelope:
+        Y1,Y2=hilbert_envelopes(Y1),hilbert_envelopes(Y2)
+    dt=np.nanmedian(np.diff(X,axis=-1),axis=-1)
+    n=Y1.shape[-1]
+    n_fft=2*n
+    correlations=np.fft.irfft(np.conj(np.fft.rfft(Y1,n=n_fft,axis=-1))*np.fft.rfft(Y2,n=n_fft,axis=-1),n=n_fft,axis=-1)
+    peaks=np.argmax(correlations,axis=-1)
+    rows=np.arange(correlations.shape[0])
+    before=correlations[rows,(peaks-1)%n_fft]
+    at=correlations[rows,peaks]
+    after=correlations[rows,(peaks+1)%n_fft]
+    curvature=before-2*at+after
+    shift=np.where(curvature!=0,0.5*(before-after)/np.where(curvature!=0,curvature,1),0)
+    # Lags beyond half of the padded length are negative delays
+    lags=np.where(peaks>=n_fft//2,peaks-n_fft,peaks)+shift
+    return lags*dt
+
+def scope_delays(X,Y1,Y2,estimator='centroid'):
+    ''' This function returns the centroids of both channels and the time delays between the channels of many scopes
+        ( arrays of shape ( number of scopes , number of samples ) ) using the chosen estimator :
+        . 'centroid' : difference between the centroids of |Y1| and |Y2|
+        . 'envelope' : difference between the centroids of the Hilbert envelopes of Y1 and Y2
+        . 'envelope_correlation' : maximum of the FFT cross-correlation of the Hilbert envelopes of Y1 and Y2
+        . 'correlation' : maximum of the FFT cross-correlation of Y1 and Y2 themselves, only valid when the carrier is well
+          sampled ( see cross_correlation_delays() ), which isn't the case of our scopes
+        the centroids being those of |Y1| and |Y2| for both correlation estimators
+    '''
+    assert estimator in ('centroid','envelope','envelope_correlation','correlation'),"Unknown estimator : "+str(estimator)
+    Y=np.stack((Y1,Y2),axis=1)
+    if estimator=='envelope':
+        Y=np.where(np.isnan(Y),np.nan,hilbert_envelopes(Y))
+    centroids=signal_centroids(X[:,np.newaxis,:],Y)
+    if estimator in ('correlation','envelope_correlation'):
+        time_delays=abs(cross_correlation_delays(X,Y1,Y2,envelope=estimator=='envelope_correlation'))
+    else:
+        time_delays=abs(centroids[:,0]-centroids[:,1])
+    return centroids[:,0],centroids[:,1],time_delays
+
+def read_scope(file_name):
+    ''' This function reads a scope csv file directly into arrays, without any intermediate txt file.
+        The two header rows ( channel labels and units ) are returned as two lists and the three numeric columns
+        as the X, Y1 and Y2 arrays, the blank cells ( for example +25.60000E-06,, ) being read as NaN values.
+    '''
+    with open(file_name,'r') as file:
+        labels=file.readline().strip().split(',')
+        units=file.readline().strip().split(',')
+        body=file.read()
+    # We turn every blank cell into 'nan' and every line break into a separator so that numpy parses the whole body at once
+    body=body.replace(',,',',nan,').replace(',,',',nan,').replace(',\n',',nan\n').strip()
+    if body.endswith(','):
+        body=body+'nan'
+    data=np.fromstring(body.replace('\n',','),sep=',').reshape(-1,3)
+    return data[:,0],data[:,1],data[:,2],(labels,units)
+
+def read_scopes(file_names):
+    ''' This function reads many scope csv files and returns their X, Y1 and Y2 columns as three 2D arrays of shape
+        ( number of scopes , number of samples ), shorter scopes being completed with NaN values.
+    '''
+    scopes=[read_scope(file_name) for file_name in file_names]
+    n_samples=max([scope[0].shape[0] for scope in scopes])
+    columns=np.full((3,len(scopes),n_samples),np.nan)
+    for i in range(len(scopes)):
+        for j in range(3):
+            columns[j,i,:scopes[i][j].shape[0]]=scopes[i][j]
+    return columns[0],columns[1],columns[2]
+
 def constant(name):
     ''' This function returns a wanted known constant value by giving its name '''
     if name=='c':
         return 299792458
 
 
+def file_hash(file_name):
+    ''' This function returns the SHA-256 hash of the content of a file '''
+    with open(file_name,'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def process_scopes(file_names,estimator='centroid'):
+    ''' This function reads many scopes and returns, for each of them, the hash of the file, the centroids of both channels,
+        their time delay and the associated group velocity ( in units of c ) through our 120 m long coaxial photonic cristal.
+        All the scopes are handled at once by scope_delays() with the chosen estimator ( see scope_delays() ).
+    '''
+    X,Y1,Y2=read_scopes(file_names)
+    t1,t2,time_delays=scope_delays(X,Y1,Y2,estimator)
+    speeds=(120/time_delays)/constant('c')
+    return [(file_hash(file_names[i]),t1[i],t2[i],time_delays[i],speeds[i]) for i in range(len(file_names))]
+
+def process_scope(file_name,estimator='centroid'):
+    ''' This function does the same as process_scopes() for a single scope '''
+    return process_scopes([file_name],estimator)[0]
+
+def read_manifest(manifest_name):
+    ''' This function reads a scopes manifest, each line holding :
+        file name;size;modification time;hash;t1;t2;time delay;speed
+        and returns a dictionnary giving for each file name the list of these values.
+    '''
+    manifest={}
+    if os.path.exists(manifest_name):
+        with open(manifest_name,'r') as file:
+            for line in file.readlines():
+                values=line.strip().split(';')
+                if len(values)==8:
+                    manifest[values[0]]=[int(values[1]),int(values[2]),values[3]]+[float(v) for v in values[4:]]
+    return manifest
+
+def write_manifest(manifest_name,manifest):
+    ''' This function writes a scopes manifest ( see read_manifest() ) through a temporary file replacing the previous
+        one at once, so that an interrupted run never leaves a half written manifest.
+    '''
+    temporary_name=manifest_name+'.tmp'
+    with open(temporary_name,'w') as file:
+        for name in sorted(manifest.keys()):
+            file.write(';'.join([name]+[str(v) for v in manifest[name]])+'\n')
+    os.replace(temporary_name,manifest_name)
+
+def process_directory(input_directory,manifest_name=None,speeds_name='speeds_in_c.txt',processes=None,estimator='centroid'):
+    ''' This function processes all the scopes of a directory incrementally : a manifest keeps the size, modification time,
+        hash and results of every scope already processed, and only the new or modified scopes ( different size or
+        modification time and then a different hash ) are read again, spread across a pool of worker processes.
+        The speeds of all the scopes, sorted by file name, are then written into the speeds_name file.
+        The delays are obtained with the chosen estimator ( see scope_delays() ), each estimator having its own manifest.
+        Returns the list of the names of the scopes that had to be processed.
+    '''
+    if manifest_name is None:
+        manifest_name=os.path.join(input_directory,'scopes_manifest.txt' if estimator=='centroid' else 'scopes_manifest_'+estimator+'.txt')
+    manifest=read_manifest(manifest_name)
+    names=sorted(name for name in os.listdir(input_directory) if is_file(name) and file_extension(name)=='csv')
+    # Files that disappeared are forgotten
+    manifest={name:manifest[name] for name in names if name in manifest}
+    candidates=[]
+    for name in names:
+        stat=os.stat(os.path.join(input_directory,name))
+        entry=manifest.get(name)
+        if entry is None or entry[0]!=stat.st_size or entry[1]!=stat.st_mtime_ns:
+            candidates.append((name,stat.st_size,stat.st_mtime_ns))
+    # A file only touched ( same content ) keeps its results
+    todo=[]
+    for name,size,mtime in candidates:
+        entry=manifest.get(name)
+        if entry is not None and entry[2]==file_hash(os.path.join(input_directory,name)):
+            entry[0],entry[1]=size,mtime
+        else:
+            todo.append((name,size,mtime))
+    paths=[os.path.join(input_directory,name) for name,size,mtime in todo]
+    # The scopes are sent to the workers by chunks, each chunk being processed in one vectorized call
+    chunk_size=max(1,len(paths)//(4*(processes or os.cpu_count())))
+    chunks=[paths[i:i+chunk_size] for i in range(0,len(paths),chunk_size)]
+    if len(chunks)>1 and processes!=1:
+        with multiprocessing.Pool(processes) as pool:
+            results=sum(pool.map(functools.partial(process_scopes,estimator=estimator),chunks),[])
+    else:
+        results=sum([process_scopes(chunk,estimator) for chunk in chunks],[])
+    for (name,size,mtime),result in zip(todo,results):
+        manifest[name]=[size,mtime]+list(result)
+    write_manifest(manifest_name,manifest)
+    with open(speeds_name,'w') as file:
+        for name in names:
+            file.write(str(manifest[name][-1])+'\n')
+    return [name for name,size,mtime in todo]
+
+
+async def watch_directory(input_directory,manifest_name=None,speeds_name='speeds_in_c.txt',processes=None,estimator='centroid',
+                          poll_interval=0.05,settle_time=0.2,stop_event=None):
+    ''' This coroutine watches a directory during the acquisition : every new ( or modified ) scope is processed as soon as
+        it is fully written, which is when its size and modification time did not change during settle_time seconds.
+        The scopes are processed in a pool of worker processes so that bursts of captures queue up without blocking the
+        watcher, and their results are added to the manifest ( see process_directory() ) while their speeds are appended
+        to the speeds_name file in the order in which the scopes appeared. The coroutine runs until stop_event is set.
+    '''
+    if manifest_name is None:
+        manifest_name=os.path.join(input_directory,'scopes_manifest.txt' if estimator=='centroid' else 'scopes_manifest_'+estimator+'.txt')
+    manifest=read_manifest(manifest_name)
+    stop_event=stop_event or asyncio.Event()
+    loop=asyncio.get_running_loop()
+    # Results are awaited in the order of submission so that the speeds are appended in that same order
+    results=asyncio.Queue()
+    # Name -> ( size , modification time , time since when they are unchanged ) of the scopes still being written
+    pending={}
+    submitted={}
+
+    async def writer():
+        while True:
+            name,size,mtime,future=await results.get()
+            if name is None:
+                return
+            try:
+                result=await future
+            except Exception as error:
+                # A scope that can't be read is tried again if it is modified
+                print('Scope ',name,' could not be processed : ',error)
+                continue
+            manifest[name]=[size,mtime]+list(result)
+            write_manifest(manifest_name,manifest)
+            with open(speeds_name,'a') as file:
+                file.write(str(result[-1])+'\n')
+            print(name,' : delay ',result[3],' s , speed ',result[-1],' c')
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        writing=asyncio.create_task(writer())
+        while not stop_event.is_set():
+            now=time.monotonic()
+            for entry in sorted(os.scandir(input_directory),key=lambda entry:entry.name):
+                if not entry.is_file() or file_extension(entry.name)!='csv':
+                    continue
+                stat=entry.stat()
+                known=manifest.get(entry.name)
+                if known is not None and known[0]==stat.st_size and known[1]==stat.st_mtime_ns:
+                    continue
+                if submitted.get(entry.name)==(stat.st_size,stat.st_mtime_ns):
+                    continue
+                previous=pending.get(entry.name)
+                if previous is None or previous[:2]!=(stat.st_size,stat.st_mtime_ns):
+                    pending[entry.name]=(stat.st_size,stat.st_mtime_ns,now)
+                elif now-previous[2]>=settle_time:
+                    del pending[entry.name]
+                    submitted[entry.name]=(stat.st_size,stat.st_mtime_ns)
+                    future=loop.run_in_executor(executor,process_scope,entry.path,estimator)
+                    results.put_nowait((entry.name,stat.st_size,stat.st_mtime_ns,future))
+            try:
+                await asyncio.wait_for(stop_event.wait(),poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        results.put_nowait((None,None,None,None))
+        await writing
+
+
 
 # MAIN PROGRAM ----------------------------------------------------------
 
@@ -100,60 +363,25 @@ def constant(name):
 #                                                                       #
 #########################################################################
 
-# We first need to specify the directory where all the scopes ( that are in a csv format ) are located
-input_directory="C://Users//engue/Desktop/scopes"
-
-# We then open a new file where all the group velocities will be stored once calculated
-time_delay_file=open('speeds_in_c.txt','w')
-# We then scan the directory mentionned for any object, be it files or other directories
-files_list = os.listdir(input_directory)
-
-Speeds=[]
-files_number=len(files_list)
-for i in range(files_number):
-    csv_file_name=files_list[i]
-    if is_file(csv_file_name) and file_extension(csv_file_name)=='csv': # We check if it is a csv format file
-        print(csv_file_name)
-        # We then create the name of a file that will contain all the values in the csv by using the name of the csv file
-        # And we also load all the values and infos of the csv into this new txt file
-        txt_file_name=name_file(csv_file_name)+'.txt'
-        with open(txt_file_name, "w") as my_output_file:
-            with open(csv_file_name, "r") as my_input_file:
-                [ my_output_file.write(" ".join(row)+'\n') for row in csv.reader(my_input_file)]
-        my_output_file.close()
-        # Once the file txt done, we read all its lines
-        txt_file=open(txt_file_name,'r')
-        LINES=txt_file.readlines()
-        txt_file.close()
-        # We get rid of useless lines ( the first and second one )
-        LINES.pop(0)
-        LINES.pop(0)
-        # Then we retrieve the values of the X coordinates and the CH1 and CH2 values, getting them
-        # into the Y1 and Y2 lists
-        n_lines=len(LINES)
-        X=[]
-        Y1=[]
-        Y2=[]
-        for j in range(n_lines):
-            line=LINES[j].split()
-            if len(line)==3:
-                X.append(float(line[0]))
-                Y1.append(float(line[1]))
-                Y2.append(float(line[2]))
-        # We transform the obtained lists into arrays
-        X=np.array(X)
-        Y1=np.array(Y1)
-        Y2=np.array(Y2)
-        # We obtain the center of masses of each Gaussian packet by using the signal_centroid() function defined above
-        t1=signal_centroid(X,Y1)
-        t2=signal_centroid(X,Y2)
-        # We then get the difference between the two
-        time_delay=abs(t1-t2)
-        # We then convert it into the group velocities by calculating the speed associated with this time delay when
-        # the signal go through our 120 m long coaxial photonic cristal
-        speed=(120/time_delay)/constant('c')
-        Speeds.append(speed)
-        # We then write this speed in the file 'speeds_in_c.txt' opened at the very beginning
-        time_delay_file.write(str(speed)+'\n')
-# Once all the scopes read and the speeds obtained we close the file, saving all the speeds in the process
-time_delay_file.close()
+if __name__=='__main__':
+    # The main programm is only run when the file is executed directly so that the functions above can be imported
+    # We first need to specify the directory where all the scopes ( that are in a csv format ) are located
+    input_directory="C://Users//engue/Desktop/scopes"
+
+    # We then process the scopes of the directory, only the scopes that are new or modified since the last run being read,
+    # and all the group velocities are saved in the file 'speeds_in_c.txt'
+    # The estimator of the delays can be 'centroid' ( centroids of |Y| ), 'envelope' ( centroids of the Hilbert envelopes ),
+    # 'envelope_correlation' ( FFT cross-correlation of the Hilbert envelopes of both channels ) or 'correlation' ( FFT
+    # cross-correlation of both channels, only valid when the carrier is well sampled, which isn't the case of our scopes )
+    estimator='centroid'
+    processed=process_directory(input_directory,speeds_name='speeds_in_c.txt',estimator=estimator)
+    print(len(processed),' scopes processed : ',processed)
+
+    # During the acquisition, the directory can also be watched so that each new scope is processed as soon as it is saved
+    # and its speed appended to 'speeds_in_c.txt' ( stop with Ctrl+C )
+    live=False
+    if live:
+        try:
+            asyncio.run(watch_directory(input_directory,speeds_name='speeds_in_c.txt',estimator=estimator))
+        except KeyboardInterrupt:
+            pass
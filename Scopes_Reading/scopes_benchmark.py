@@ -0,0 +1,133 @@
+#########################################################################
+#                                                                       #
+#   The goal of this program is to create synthetic oscilloscope        #
+#   scopes, written in the same csv format as the real ones, and to     #
+#   measure how fast the scopes are processed by center_masses.py       #
+#   ( reading, centroids and group velocity ) for longer records and    #
+#   more files than the ones we measured.                               #
+#                                                                       #
+#   This programm is coded in Python language and needs special         #
+#   libraries to work. Especially Numpy, Os, Time and Tracemalloc       #
+#   libraries are necessary and the programm can't work without them.   #
+#                                                                       #
+#########################################################################
+
+
+
+# IMPORTS ---------------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We first import the necessary libraries like mentionned.            #
+#                                                                       #
+#########################################################################
+
+import numpy as np
+import os
+import time
+import tracemalloc
+import tempfile
+import shutil
+import center_masses
+
+
+
+# FUNCTIONS -------------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We then need a few functions to easy up the rest of the programm.   #
+#                                                                       #
+#########################################################################
+
+def synthetic_scope(file_name,n_samples=2002,dt=25e-9,t0=25.6e-6,frequency=1e6,width=5e-6,delay=6e-7,transmission=0.8,
+                    amplitude=1.0,noise=0.01,bits=None,rng=None):
+    ''' This function writes a synthetic scope csv file with the two header rows of our oscilloscope :
+        x-axis,1,2
+        second,Volt,Volt
+        followed by n_samples rows. The first channel holds a Gaussian packet ( carrier frequency , time width width ) centered
+        on the middle of the record and the second channel the same packet delayed by delay and multiplied by transmission.
+        A Gaussian noise of standard deviation noise * amplitude is added on both channels and, if bits is given, the values
+        are quantized like with an analog to digital converter of that resolution. The first row has blank channels like
+        the real scopes.
+    '''
+    rng=rng or np.random.default_rng()
+    X=t0+dt*np.arange(n_samples)
+    center=X[n_samples//2]-delay/2
+    packet=lambda t:amplitude*np.sin(2*np.pi*frequency*(t-center))*np.exp(-((t-center)/width)**2/2)
+    Y1=packet(X)+noise*amplitude*rng.standard_normal(n_samples)
+    Y2=transmission*packet(X-delay)+noise*amplitude*rng.standard_normal(n_samples)
+    if bits is not None:
+        step=2*amplitude/2**bits
+        Y1,Y2=np.round(Y1/step)*step,np.round(Y2/step)*step
+    with open(file_name,'w') as file:
+        file.write('x-axis,1,2\nsecond,Volt,Volt\n')
+        file.write('%+.5E,,\n'%X[0])
+        np.savetxt(file,np.column_stack((X[1:],Y1[1:],Y2[1:])),fmt=['%+.5E','%+.8E','%+.8E'],delimiter=',')
+    return X,Y1,Y2
+
+def synthetic_scopes(output_directory,n_files,n_samples=2002,delays=(5e-7,8e-7),seed=0,**parameters):
+    ''' This function writes n_files synthetic scopes scope_XXXX.csv in output_directory, their delays being drawn uniformly
+        between delays[0] and delays[1], and returns the list of their names and the array of their delays. The other
+        parameters are the ones of synthetic_scope().
+    '''
+    rng=np.random.default_rng(seed)
+    os.makedirs(output_directory,exist_ok=True)
+    file_names=[]
+    scope_delays=rng.uniform(delays[0],delays[1],n_files)
+    for i in range(n_files):
+        file_names.append(os.path.join(output_directory,'scope_'+str(i).zfill(4)+'.csv'))
+        synthetic_scope(file_names[-1],n_samples,delay=scope_delays[i],rng=rng,**parameters)
+    return file_names,scope_delays
+
+def benchmark(file_names,chunk_size=16,estimator='centroid'):
+    ''' This function processes the scopes file_names by chunks of chunk_size scopes with center_masses.process_scopes()
+        and returns the number of files per second, the number of samples per second ( counting the rows of the files ),
+        the peak of memory allocated during the processing ( in bytes ) and the results of process_scopes().
+    '''
+    n_samples=0
+    for file_name in file_names:
+        with open(file_name,'rb') as file:
+            n_samples+=sum(block.count(b'\n') for block in iter(lambda:file.read(1<<20),b''))-2
+    tracemalloc.start()
+    start=time.perf_counter()
+    results=[]
+    for i in range(0,len(file_names),chunk_size):
+        results+=center_masses.process_scopes(file_names[i:i+chunk_size],estimator)
+    duration=time.perf_counter()-start
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return len(file_names)/duration,n_samples/duration,peak,results
+
+
+
+# MAIN PROGRAM ----------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We then code the main programm and use all that we defined above.   #
+#                                                                       #
+#########################################################################
+
+if __name__=='__main__':
+    # We first choose the record lengths to test, the number of files for each of them and the size of the chunks of scopes
+    # processed at once ( the memory needed grows with the chunk size times the record length )
+    record_lengths=[2002,20000,200000,2000000]
+    n_files=[64,32,8,2]
+    chunk_size=8
+    estimator='centroid'
+
+    # The synthetic scopes are written in a temporary directory removed at the end
+    directory=tempfile.mkdtemp()
+    try:
+        print('samples/scope  files   files/s      samples/s     peak memory ( MB )   max delay error ( s )')
+        for n_samples,n in zip(record_lengths,n_files):
+            # The time step is chosen so that the packets always fit in the record
+            dt=25e-9*2002/n_samples
+            file_names,delays=synthetic_scopes(os.path.join(directory,str(n_samples)),n,n_samples,dt=dt)
+            files_rate,samples_rate,peak,results=benchmark(file_names,chunk_size,estimator)
+            error=max(abs(result[3]-delay) for result,delay in zip(results,delays))
+            print('%13d  %5d  %9.2f  %13.4E  %19.2f  %22.3E'%(n_samples,n,files_rate,samples_rate,peak/2**20,error))
+            shutil.rmtree(os.path.join(directory,str(n_samples)))
+    finally:
+        shutil.rmtree(directory,ignore_errors=True)
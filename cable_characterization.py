@@ -0,0 +1,257 @@
+#########################################################################
+#                                                                       #
+#   The goal of this program is to characterize the coaxial cables      #
+#   used in our model : the attenuation coefficients of a cable are     #
+#   calculated from the input and output amplitudes measured at many    #
+#   frequencies on a given length of cable and stored into a txt file   #
+#   for further use.                                                    #
+#   The cables are described in the 'cables.txt' file so that a new     #
+#   cable only needs a new line in that file and its measurements.      #
+#   The attenuations are then fitted with linear models solved by       #
+#   least squares, along with the uncertainties of their coefficients.  #
+#                                                                       #
+#   This programm is coded in Python language and needs special         #
+#   libraries to work. Especially Numpy and Os libraries are            #
+#   necessary and the programm can't work without them.                 #
+#                                                                       #
+#########################################################################
+
+
+
+# IMPORTS ---------------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We first import the necessary libraries like mentionned.            #
+#                                                                       #
+#########################################################################
+
+import numpy as np
+import os
+
+
+
+# FUNCTIONS -------------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We then need a few functions to easy up the rest of the programm.   #
+#                                                                       #
+#########################################################################
+
+def read_measurements(file_name):
+    '''
+    This function reads a measurements file of a cable, with a first header row and then one row per frequency :
+    frequency (Hz);input amplitude (V);output amplitude (V)
+    ( the file can start with a byte order mark and use decimal commas ) and returns the frequencies, the input amplitudes
+    and the output amplitudes as three arrays.
+    '''
+    with open(file_name,'r',encoding='utf-8-sig') as file:
+        file.readline()
+        body=file.read()
+    data=np.loadtxt(body.replace(',','.').splitlines(),delimiter=';',ndmin=2)
+    return data[:,0],data[:,1],data[:,2]
+
+def attenuations(input_amplitudes,output_amplitudes,length):
+    '''
+    This function returns the attenuation coefficients ( in 1/m ) of a cable of a given length ( in m ) from the input
+    and output amplitudes measured at its ends, for all the frequencies at once.
+    '''
+    return -np.log(np.asarray(output_amplitudes)/np.asarray(input_amplitudes))/length
+
+def write_attenuations(file_name,frequencies,attenuations):
+    '''
+    This function writes the attenuations file read by the model and the regressions, set up this way :
+    frequency
+    attenuation
+    frequency
+    attenuation
+    ....
+    '''
+    lines=np.column_stack((frequencies,attenuations)).ravel()
+    with open(file_name,'w') as file:
+        file.write(''.join(str(float(value))+'\n' for value in lines))
+
+def read_cables(file_name):
+    '''
+    This function reads the cables description file, every line ( except the empty ones and the comments starting with
+    '#' ) being :
+    name;measurements file;length of the measured cable (m)
+    the measurements files being relative to the description file, and returns a list of dictionnaries.
+    '''
+    cables=[]
+    with open(file_name,'r',encoding='utf-8-sig') as file:
+        for line in file.readlines():
+            line=line.strip()
+            if len(line)==0 or line.startswith('#'):
+                continue
+            name,measurements,length=[value.strip() for value in line.split(';')]
+            cables.append({'name':name,
+                           'measurements':os.path.join(os.path.dirname(os.path.abspath(file_name)),measurements),
+                           'length':float(length)})
+    return cables
+
+def characterize_cable(measurements_file,length,attenuations_file=None):
+    '''
+    This function calculates the attenuations of a cable from its measurements file in one step and, if an attenuations
+    file name is given, writes them into it. It returns the frequencies and the attenuations as two arrays.
+    '''
+    frequencies,input_amplitudes,output_amplitudes=read_measurements(measurements_file)
+    cable_attenuations=attenuations(input_amplitudes,output_amplitudes,length)
+    if attenuations_file is not None:
+        write_attenuations(attenuations_file,frequencies,cable_attenuations)
+    return frequencies,cable_attenuations
+
+def model_basis(model,w,center,scale,degree=4):
+    '''
+    This function returns the matrix of the basis functions of a linear attenuation model at the pulsations w ( shape
+    ( ... , len(w) , number of coefficients ) ), the pulsations being scaled as u=(w-center)/scale to keep it well
+    conditioned :
+    . 'polynomial' : 1 , u , u**2 , ... , u**degree
+    . 'skin_effect' : 1 , sqrt(w/scale) , w/scale ( constant, conductor and dielectric losses )
+    . 'logarithmic' : 1 , u , the fitted values being exp(-length*attenuation) ( see fit_attenuations() )
+    '''
+    w=np.asarray(w,dtype=float)
+    u=(w-center)/scale
+    if model=='polynomial':
+        return u[...,np.newaxis]**np.arange(degree+1)
+    if model=='skin_effect':
+        return np.stack((np.ones_like(w),np.sqrt(w/scale),w/scale),axis=-1)
+    if model=='logarithmic':
+        return np.stack((np.ones_like(w),u),axis=-1)
+    raise ValueError("Unknown attenuation model : "+str(model))
+
+def fit_attenuations(w,cable_attenuations,model='polynomial',degree=4,length=None,center=None,scale=None):
+    '''
+    This function fits the attenuations of one or many cables ( cable_attenuations of shape ( number of cables , len(w) )
+    or ( len(w) , ), w being shared by all the cables or of the same shape ) with a linear model of model_basis(), solved
+    in one batched linear least squares ( through the pseudo inverses of the basis matrices ) without any iteration.
+    The 'logarithmic' model is the one of the researchers, attenuation=-log(a+b*u)/length, fitted on exp(-length*attenuation),
+    length being the one of the measured cable ( in m, the one of its line of 'cables.txt' ) and only used by that model.
+    It returns a dictionnary holding the model, its scaling ( and its length ) and, for every cable, the coefficients, their covariance
+    matrix and their standard deviations, to be used with evaluate_fit(). The pulsations are scaled on their range unless
+    center and scale are given.
+    '''
+    w=np.asarray(w,dtype=float)
+    Y=np.asarray(cable_attenuations,dtype=float)
+    center=(np.max(w)+np.min(w))/2 if center is None else center
+    scale=(np.max(w)-np.min(w))/2 if scale is None else scale
+    if model=='logarithmic':
+        if length is None:
+            raise ValueError("The logarithmic model needs the length of the measured cable")
+        Y=np.exp(-length*Y)
+    A=model_basis(model,w,center,scale,degree)
+    pseudo_inverse=np.linalg.pinv(A)
+    coefficients=np.einsum('...pn,...n->...p',pseudo_inverse,Y)
+    residuals=Y-np.einsum('...np,...p->...n',A,coefficients)
+    n,p=A.shape[-2],A.shape[-1]
+    variances=np.sum(residuals**2,axis=-1)/max(n-p,1)
+    # ( A^T A )^-1 is the product of the pseudo inverse with its transpose
+    covariance=variances[...,np.newaxis,np.newaxis]*np.einsum('...pn,...qn->...pq',pseudo_inverse,pseudo_inverse)
+    fit={'model':model,'degree':degree,'center':center,'scale':scale,
+         'coefficients':coefficients,'covariance':covariance,
+         'uncertainties':np.sqrt(np.diagonal(covariance,axis1=-2,axis2=-1))}
+    if model=='logarithmic':
+        fit['length']=length
+    return fit
+
+def evaluate_fit(fit,w):
+    '''
+    This function returns the attenuations given by a fit of fit_attenuations() at the pulsations w ( for every cable
+    fitted, the last axis being the one of w ).
+    '''
+    A=model_basis(fit['model'],w,fit['center'],fit['scale'],fit['degree'])
+    values=np.einsum('np,...p->...n',A,fit['coefficients'])
+    if fit['model']=='logarithmic':
+        return -np.log(values)/fit['length']
+    return values
+
+def bootstrap_attenuations(w,cable_attenuations,n_resamples=1000,seed=0,**parameters):
+    '''
+    This function fits n_resamples bootstrap resamples of the measurements of a cable ( frequencies drawn with
+    replacement ) in one batched call of fit_attenuations() and returns the coefficients of all the resamples ( shape
+    ( n_resamples , number of coefficients ) ) and their standard deviations. The seed makes the resamples reproducible.
+    The other parameters are the ones of fit_attenuations().
+    '''
+    w=np.asarray(w,dtype=float)
+    rng=np.random.default_rng(seed)
+    indexes=rng.integers(0,len(w),size=(n_resamples,len(w)))
+    # The scaling is the one of the whole measurements for the coefficients of all the resamples to be comparable
+    fit=fit_attenuations(w[indexes],np.asarray(cable_attenuations,dtype=float)[indexes],
+                         center=(np.max(w)+np.min(w))/2,scale=(np.max(w)-np.min(w))/2,**parameters)
+    return fit['coefficients'],np.std(fit['coefficients'],axis=0)
+
+fit_version=1
+
+def write_fit(file_name,fit,name,index=None):
+    '''
+    This function writes a fit of fit_attenuations() ( the one of the cable of the given index if many cables were fitted
+    at once ) in a coefficients file read by the model of the photonic cristal, one field per line :
+    version;1
+    cable;RG58U
+    model;polynomial
+    ....
+    coefficients;c0;c1;...
+    The file is written through a temporary file replacing the previous one at once.
+    '''
+    coefficients=fit['coefficients'] if index is None else fit['coefficients'][index]
+    uncertainties=fit['uncertainties'] if index is None else fit['uncertainties'][index]
+    fields=[('version',fit_version),('cable',name),('model',fit['model']),('degree',fit['degree'])]
+    # The length is only written for the model using it
+    if 'length' in fit:
+        fields.append(('length',repr(float(fit['length']))))
+    fields+=[('center',repr(float(fit['center']))),('scale',repr(float(fit['scale'])))]
+    lines=[key+';'+str(value) for key,value in fields]
+    lines.append(';'.join(['coefficients']+[repr(float(value)) for value in coefficients]))
+    lines.append(';'.join(['uncertainties']+[repr(float(value)) for value in uncertainties]))
+    temporary_name=file_name+'.tmp'
+    with open(temporary_name,'w') as file:
+        file.write('\n'.join(lines)+'\n')
+    os.replace(temporary_name,file_name)
+
+def read_fit(file_name):
+    '''
+    This function reads a coefficients file written by write_fit() and returns the fit as a dictionnary usable by
+    evaluate_fit(), along with the name of the cable.
+    '''
+    fields={}
+    with open(file_name,'r') as file:
+        for line in file.readlines():
+            values=line.strip().split(';')
+            if len(values)>1:
+                fields[values[0]]=values[1:]
+    if int(fields['version'][0])!=fit_version:
+        raise ValueError("Unsupported coefficients file version : "+fields['version'][0])
+    fit={'model':fields['model'][0],'degree':int(fields['degree'][0]),
+         'center':float(fields['center'][0]),'scale':float(fields['scale'][0]),
+         'coefficients':np.array([float(value) for value in fields['coefficients']]),
+         'uncertainties':np.array([float(value) for value in fields['uncertainties']])}
+    if 'length' in fields:
+        fit['length']=float(fields['length'][0])
+    return fit,fields['cable'][0]
+
+
+# MAIN PROGRAM ----------------------------------------------------------
+
+#########################################################################
+#                                                                       #
+#   We then code the main programm and use all that we defined above.   #
+#                                                                       #
+#########################################################################
+
+if __name__=='__main__':
+    # We calculate the attenuations of every cable described in 'cables.txt' and write them into the 'attenuations.txt' file
+    # next to its measurements, where the model reads them
+    directory=os.path.dirname(os.path.abspath(__file__))
+    for cable in read_cables(os.path.join(directory,'cables.txt')):
+        attenuations_file=os.path.join(os.path.dirname(cable['measurements']),'attenuations.txt')
+        frequencies,cable_attenuations=characterize_cable(cable['measurements'],cable['length'],attenuations_file)
+        print(cable['name'],' : ',len(frequencies),' frequencies from ',frequencies[0],' Hz to ',frequencies[-1],' Hz')
+        # We then fit the attenuations according to the pulsations with a polynomial of the scaled pulsations
+        # and write the coefficients in the 'attenuation_fit.txt' file next to the measurements, where the model reads them
+        fit=fit_attenuations(2*np.pi*frequencies,cable_attenuations,'polynomial',4)
+        write_fit(os.path.join(os.path.dirname(cable['measurements']),'attenuation_fit.txt'),fit,cable['name'])
+        print('    coefficients : ',fit['coefficients'],' +/- ',fit['uncertainties'])
+        # The logarithmic model of the researchers is fitted on the length of the measured cable, for comparison
+        logarithmic_fit=fit_attenuations(2*np.pi*frequencies,cable_attenuations,'logarithmic',length=cable['length'])
+        print('    logarithmic coefficients : ',logarithmic_fit['coefficients'],' +/- ',logarithmic_fit['uncertainties'])